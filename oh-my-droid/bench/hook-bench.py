@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Hook Cold-Start Benchmark for oh-my-droid
+
+Runs every hook script against the recorded sample payloads in
+payloads/, each time in a fresh interpreter, and reports exec-to-exit
+wall time (p50/p95/p99), import time (from -X importtime) and peak RSS.
+Hooks run against a scratch HOME and project, never your real state.
+
+Usage:
+    python3 hook-bench.py run [--runs N] [--case NAME]... [--write-baseline [PATH]]
+    python3 hook-bench.py check [--baseline PATH] [--tolerance 0.25] [--budget 0.5]
+    python3 hook-bench.py list
+
+`check` exits 1 when a hook got slower than the stored baseline, or when
+its p99 uses more than --budget of the event's timeout in hooks.json.
+"""
+
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+HOOKS_DIR = BENCH_DIR.parent / "hooks"
+CASES_FILE = BENCH_DIR / "cases.json"
+PAYLOADS_DIR = BENCH_DIR / "payloads"
+DEFAULT_BASELINE = Path.home() / ".factory" / ".omd" / "bench" / "hook-baseline.json"
+
+sys.path.insert(0, str(HOOKS_DIR))
+from omd_ring import percentile  # noqa: E402
+
+DEFAULT_RUNS = 30
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_BUDGET = 0.5
+# Noise floor: differences below this are never reported as regressions
+MIN_REGRESSION_MS = 5.0
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def load_cases() -> dict:
+    return json.loads(CASES_FILE.read_text())
+
+
+def load_event_timeouts() -> dict:
+    """Event name -> timeout in seconds, from hooks.json."""
+    config = json.loads((HOOKS_DIR / "hooks.json").read_text())
+    timeouts = {}
+    for event, groups in config.get("hooks", {}).items():
+        for group in groups:
+            for hook in group.get("hooks", []):
+                timeouts[event] = max(timeouts.get(event, 0), hook.get("timeout", 60))
+    return timeouts
+
+
+def make_scratch() -> Path:
+    """Create a scratch HOME and project seeded with typical .omd state."""
+    root = Path(tempfile.mkdtemp(prefix="omd-bench-"))
+    home = root / "home"
+    project = root / "project"
+    (home / ".factory").mkdir(parents=True)
+    (project / "src").mkdir(parents=True)
+    (project / ".omd" / "state").mkdir(parents=True)
+
+    (project / "package.json").write_text(json.dumps({
+        "name": "bench-project",
+        "scripts": {"build": "tsc", "test": "jest", "lint": "eslint ."},
+        "dependencies": {"express": "^4.0.0"},
+    }, indent=2))
+    (project / "src" / "auth.ts").write_text("export const ok = () => true;\n")
+    (project / ".omd" / "todos.json").write_text(json.dumps({
+        "todos": [
+            {"id": str(i), "content": f"Task {i}", "status": status}
+            for i, status in enumerate(["completed", "in_progress", "pending", "pending"])
+        ]
+    }, indent=2))
+    (project / ".omd" / "state" / "subagent-tracking.json").write_text(json.dumps({
+        "agents": [{"agent_type": "oh-my-droid:executor-med", "status": "running"}],
+        "total_spawned": 3,
+        "total_completed": 2,
+        "total_failed": 0,
+    }, indent=2))
+    return root
+
+
+def build_payload(case: dict, project: Path) -> bytes:
+    text = (PAYLOADS_DIR / case["payload"]).read_text()
+    return text.replace("$PROJECT", str(project)).encode()
+
+
+def bench_env(scratch: Path) -> dict:
+    env = dict(os.environ)
+    env["HOME"] = str(scratch / "home")
+    # Never talk to a real hook daemon; this measures cold starts
+    env["OMD_HOOKD_SOCKET"] = str(scratch / "no-daemon.sock")
+    env.pop("OMD_HOOKD_AUTOSTART", None)
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def run_once(argv: list, payload: bytes, env: dict, cwd: Path) -> tuple:
+    """Run one hook process. Returns (wall_ms, peak_rss_kb, stdout, stderr)."""
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout, \
+            tempfile.TemporaryFile() as stderr:
+        stdin.write(payload)
+        stdin.seek(0)
+
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            argv, stdin=stdin, stdout=stdout, stderr=stderr, env=env, cwd=str(cwd)
+        )
+        # wait4 instead of proc.wait() to get this child's own rusage
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall_ms = (time.perf_counter() - start) * 1000
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        out, err = stdout.read(), stderr.read()
+
+    rss_kb = usage.ru_maxrss
+    if sys.platform == "darwin":
+        rss_kb //= 1024
+    return wall_ms, rss_kb, out, err
+
+
+def parse_importtime(stderr: bytes, top: int = 8) -> dict:
+    """Summarise -X importtime output: total and slowest top-level imports."""
+    total_us = 0
+    modules = []
+    for line in stderr.decode("utf-8", "replace").splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if not m:
+            continue
+        cumulative = int(m.group(2))
+        depth = (len(m.group(3)) - 1) // 2
+        if depth == 0:
+            total_us += cumulative
+            modules.append((cumulative, m.group(4)))
+    modules.sort(reverse=True)
+    return {
+        "import_ms": round(total_us / 1000, 2),
+        "top_imports": [
+            {"module": name, "cumulative_ms": round(us / 1000, 2)}
+            for us, name in modules[:top]
+        ],
+    }
+
+
+def bench_case(name: str, case: dict, runs: int, scratch: Path) -> dict:
+    project = scratch / "project"
+    env = bench_env(scratch)
+    payload = build_payload(case, project)
+    argv = [sys.executable, str(HOOKS_DIR / case["command"][0])] + case["command"][1:]
+
+    # Warm the OS page cache and __pycache__ once
+    _, _, stdout, stderr = run_once(argv, payload, env, project)
+    valid = True
+    try:
+        json.loads(stdout)
+    except ValueError:
+        valid = False
+
+    walls = []
+    peak_rss = 0
+    for _ in range(runs):
+        wall_ms, rss_kb, _, _ = run_once(argv, payload, env, project)
+        walls.append(wall_ms)
+        peak_rss = max(peak_rss, rss_kb)
+
+    _, _, _, stderr = run_once(
+        [sys.executable, "-X", "importtime"] + argv[1:], payload, env, project
+    )
+
+    result = {
+        "event": case.get("event"),
+        "runs": runs,
+        "valid_json": valid,
+        "p50_ms": round(percentile(walls, 50), 2),
+        "p95_ms": round(percentile(walls, 95), 2),
+        "p99_ms": round(percentile(walls, 99), 2),
+        "mean_ms": round(sum(walls) / len(walls), 2) if walls else 0.0,
+        "max_ms": round(max(walls), 2) if walls else 0.0,
+        "peak_rss_kb": peak_rss,
+    }
+    result.update(parse_importtime(stderr))
+    return result
+
+
+def run_suite(runs: int, only: Optional[list] = None) -> dict:
+    cases = load_cases()
+    if only:
+        unknown = [n for n in only if n not in cases]
+        if unknown:
+            raise SystemExit(f"Unknown case(s): {', '.join(unknown)}")
+        cases = {n: c for n, c in cases.items() if n in only}
+
+    results = {}
+    for name, case in cases.items():
+        scratch = make_scratch()
+        try:
+            results[name] = bench_case(name, case, runs, scratch)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        r = results[name]
+        print(
+            f"{name:34} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  "
+            f"p99 {r['p99_ms']:8.2f} ms  import {r['import_ms']:7.2f} ms  "
+            f"rss {r['peak_rss_kb'] / 1024:6.1f} MB"
+            + ("" if r["valid_json"] else "  [INVALID OUTPUT]"),
+            file=sys.stderr,
+        )
+
+    return {
+        "version": 1,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": runs,
+        "hooks": results,
+    }
+
+
+def check_regressions(current: dict, baseline: dict, tolerance: float, budget: float) -> list:
+    timeouts = load_event_timeouts()
+    failures = []
+    for name, result in current["hooks"].items():
+        if not result["valid_json"]:
+            failures.append(f"{name}: output is not valid JSON")
+
+        timeout_ms = timeouts.get(result.get("event"), 0) * 1000
+        if timeout_ms and result["p99_ms"] > timeout_ms * budget:
+            failures.append(
+                f"{name}: p99 {result['p99_ms']:.1f} ms exceeds {budget:.0%} "
+                f"of the {timeout_ms / 1000:.0f}s {result['event']} timeout"
+            )
+
+        base = baseline.get("hooks", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            limit = base[metric] * (1 + tolerance)
+            if result[metric] > limit and result[metric] - base[metric] > MIN_REGRESSION_MS:
+                failures.append(
+                    f"{name}: {metric} {result[metric]:.1f} ms > baseline "
+                    f"{base[metric]:.1f} ms (+{tolerance:.0%})"
+                )
+    return failures
+
+
+def parse_options(args: list) -> dict:
+    opts = {"runs": DEFAULT_RUNS, "cases": [], "baseline": None,
+            "write_baseline": False, "tolerance": DEFAULT_TOLERANCE,
+            "budget": DEFAULT_BUDGET}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == "--runs" and value:
+            opts["runs"] = int(value)
+            i += 1
+        elif arg == "--case" and value:
+            opts["cases"].append(value)
+            i += 1
+        elif arg == "--baseline" and value:
+            opts["baseline"] = Path(value)
+            i += 1
+        elif arg == "--tolerance" and value:
+            opts["tolerance"] = float(value)
+            i += 1
+        elif arg == "--budget" and value:
+            opts["budget"] = float(value)
+            i += 1
+        elif arg == "--write-baseline":
+            opts["write_baseline"] = True
+            if value and not value.startswith("--"):
+                opts["baseline"] = Path(value)
+                i += 1
+        else:
+            raise SystemExit(f"Unknown option: {arg}")
+        i += 1
+    return opts
+
+
+def cmd_run(args: list) -> None:
+    """Benchmark hooks and print the results as JSON"""
+    opts = parse_options(args)
+    report = run_suite(opts["runs"], opts["cases"])
+    print(json.dumps(report, indent=2))
+
+    if opts["write_baseline"]:
+        path = opts["baseline"] or DEFAULT_BASELINE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2))
+        print(f"Baseline written to {path}", file=sys.stderr)
+
+
+def cmd_check(args: list) -> None:
+    """Benchmark hooks and fail on regressions against the baseline"""
+    opts = parse_options(args)
+    path = opts["baseline"] or DEFAULT_BASELINE
+    baseline = json.loads(path.read_text()) if path.exists() else {}
+    if not baseline:
+        print(f"No baseline at {path}; checking timeout budgets only", file=sys.stderr)
+
+    report = run_suite(opts["runs"], opts["cases"])
+    failures = check_regressions(report, baseline, opts["tolerance"], opts["budget"])
+    print(json.dumps({"passed": not failures, "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+def cmd_list(args: list) -> None:
+    """List benchmark cases"""
+    for name, case in load_cases().items():
+        print(f"{name:34} {case['event']:18} {' '.join(case['command'])}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    command = sys.argv[1]
+    commands = {
+        "run": cmd_run,
+        "check": cmd_check,
+        "list": cmd_list,
+    }
+
+    if command in commands:
+        commands[command](sys.argv[2:])
+    else:
+        print(f"Unknown command: {command}")
+        print("Available commands: run, check, list")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
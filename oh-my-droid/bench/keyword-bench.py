@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Keyword Detector Benchmark for oh-my-droid
+
+Times keyword detection in keyword-detector.py on large and adversarial
+prompts (unbalanced fences, thousands of lone backticks, URL floods,
+multi-megabyte log pastes) at doubling sizes, with and without the
+head/tail scan window. Time per MB should stay flat as sizes double;
+a growing ratio means the scan went superlinear.
+
+Usage:
+    python3 keyword-bench.py [--max-mb N] [--runs N] [--json]
+"""
+
+import importlib.util
+import json
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+HOOKS_DIR = BENCH_DIR.parent / "hooks"
+
+DEFAULT_MAX_MB = 10
+DEFAULT_RUNS = 3
+LOG_LINE = "2026-01-01T12:00:00Z INFO worker-3 processed batch=1234 status=ok path=/var/log/app\n"
+
+# name -> function(size in chars) -> prompt
+CASES = {
+    "log-paste": lambda n: (LOG_LINE * (n // len(LOG_LINE) + 1))[:n],
+    "lone-backticks": lambda n: ("word ` " * (n // 7 + 1))[:n],
+    "unclosed-fences": lambda n: ("```\nsome code line\n" * (n // 19 + 1))[:n],
+    "backtick-runs": lambda n: ("``" + "x" * 30 + "\n") * (n // 33 + 1),
+    "url-flood": lambda n: ("https://example.com/" + "a" * 60 + " ") * (n // 81 + 1),
+    "keyword-dense": lambda n: ("plan the pipeline with eco budget " * (n // 34 + 1))[:n],
+}
+
+
+def load_detector():
+    # keyword-detector.py imports the omd_* modules next to it
+    sys.path.insert(0, str(HOOKS_DIR))
+    spec = importlib.util.spec_from_file_location(
+        "keyword_detector", HOOKS_DIR / "keyword-detector.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_detect(detector, prompt: str, window: int, runs: int) -> float:
+    """Best-of-runs seconds for one detect_keywords call."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        detector.detect_keywords(prompt, window)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(max_mb: int, runs: int) -> dict:
+    detector = load_detector()
+    sizes = []
+    mb = 1
+    while mb <= max_mb:
+        sizes.append(mb)
+        mb *= 2
+    if sizes[-1] != max_mb:
+        sizes.append(max_mb)
+
+    results = {}
+    for name, build in CASES.items():
+        rows = []
+        for mb in sizes:
+            prompt = build(mb * 1024 * 1024)
+            full = time_detect(detector, prompt, 0, runs)
+            windowed = time_detect(detector, prompt, detector.DEFAULT_SCAN_WINDOW, runs)
+            rows.append({
+                "mb": mb,
+                "full_ms": round(full * 1000, 2),
+                "full_ms_per_mb": round(full * 1000 / mb, 2),
+                "window_ms": round(windowed * 1000, 3),
+            })
+        per_mb = [r["full_ms_per_mb"] for r in rows]
+        results[name] = {
+            "sizes": rows,
+            # Largest over smallest time per MB; ~1.0 means linear
+            "growth": round(per_mb[-1] / per_mb[0], 2) if per_mb[0] else 0.0,
+        }
+    return {
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "window_chars": detector.DEFAULT_SCAN_WINDOW,
+        "cases": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"keyword-detector scan (best of {report['runs']}, python {report['python']}, "
+          f"window {report['window_chars']} chars)")
+    print(f"\n  {'case':18} {'MB':>4} {'full ms':>10} {'ms/MB':>8} {'window ms':>10}")
+    for name, case in report["cases"].items():
+        for r in case["sizes"]:
+            print(f"  {name:18} {r['mb']:4d} {r['full_ms']:10.2f} "
+                  f"{r['full_ms_per_mb']:8.2f} {r['window_ms']:10.3f}")
+        print(f"  {'':18} growth {case['growth']:.2f}x")
+
+
+def main():
+    args = sys.argv[1:]
+    max_mb, runs, as_json = DEFAULT_MAX_MB, DEFAULT_RUNS, False
+    i = 0
+    while i < len(args):
+        if args[i] == "--max-mb" and i + 1 < len(args):
+            max_mb = max(1, int(args[i + 1]))
+            i += 1
+        elif args[i] == "--runs" and i + 1 < len(args):
+            runs = max(1, int(args[i + 1]))
+            i += 1
+        elif args[i] == "--json":
+            as_json = True
+        else:
+            print(__doc__)
+            sys.exit(1)
+        i += 1
+
+    report = run(max_mb, runs)
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Task Creation Benchmark for oh-my-droid
+
+Times StateManager.create_tasks() on each task store backend against a
+scratch HOME: creations per second for batches of --batch tasks (each
+batch made durable before the next), next to create_task() one at a
+time (no fsync). Also checks that every ID is unique, that IDs ascend
+in creation order, and that the status counters still match the tasks
+after concurrent status updates from several threads.
+
+Usage:
+    python3 state-bench.py [--tasks N] [--batch N] [--backend NAME] [--json]
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+HOOKS_DIR = BENCH_DIR.parent / "hooks"
+
+DEFAULT_TASKS = 5000
+DEFAULT_BATCH = 500
+# create_task() one at a time is much slower; time fewer of them
+SINGLE_TASKS = 500
+
+ROUTING = {"agent": "executor-med", "autonomy": "medium",
+           "reason": "Benchmark", "confidence": 1.0}
+
+# Concurrent status updates: threads x updates each, over a few tasks
+THREADS = 8
+UPDATES = 100
+SHARED_TASKS = 20
+STATUSES = ["pending", "executing", "completed"]
+
+
+def load_state_manager(home: Path):
+    """Import state-manager.py with its state under a scratch HOME"""
+    os.environ["HOME"] = str(home)
+    sys.path.insert(0, str(HOOKS_DIR))
+    spec = importlib.util.spec_from_file_location(
+        "state_manager", HOOKS_DIR / "state-manager.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench_backend(sm, name: str, tasks: int, batch: int, state_dir: Path) -> dict:
+    shutil.rmtree(state_dir, ignore_errors=True)
+    store = sm.omd_task_store.open_store(state_dir, name)
+    manager = sm.StateManager(store)
+    ids = []
+    try:
+        start = time.perf_counter()
+        for first in range(0, tasks, batch):
+            ids.extend(manager.create_tasks([
+                {"prompt": f"subtask {n}", "routing": ROUTING}
+                for n in range(first, min(first + batch, tasks))
+            ]))
+        batched = time.perf_counter() - start
+
+        single_ids = []
+        start = time.perf_counter()
+        for n in range(SINGLE_TASKS):
+            single_ids.append(manager.create_task(f"single {n}", ROUTING))
+        single = time.perf_counter() - start
+
+        ids.extend(single_ids)
+        stored = sum(store.counts().values())
+        consistent = concurrent_updates(sm, store, state_dir, name)
+    finally:
+        store.close()
+
+    return {
+        "backend": name,
+        "batched_per_s": round(tasks / batched) if batched else 0,
+        "batched_s": round(batched, 3),
+        "single_per_s": round(SINGLE_TASKS / single) if single else 0,
+        "unique": len(set(ids)) == len(ids) == stored,
+        "ascending": ids == sorted(ids),
+        "consistent": consistent,
+    }
+
+
+def concurrent_updates(sm, store, state_dir: Path, name: str) -> bool:
+    """Update a few tasks' status from several threads; do the counters still match the tasks?"""
+    shared = sm.StateManager(store).create_tasks([{"prompt": f"shared {n}", "routing": ROUTING}
+                                                  for n in range(SHARED_TASKS)])
+
+    def worker(seed: int) -> None:
+        # A store per thread, like separate hook runs
+        own = sm.omd_task_store.open_store(state_dir, name)
+        manager = sm.StateManager(own)
+        try:
+            for n in range(UPDATES):
+                manager.update_task(shared[(seed + n) % SHARED_TASKS],
+                                    {"status": STATUSES[(seed * 7 + n) % len(STATUSES)]})
+        finally:
+            own.close()
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    actual = {}
+    for task in store.tasks():
+        actual[task["status"]] = actual.get(task["status"], 0) + 1
+    return {k: v for k, v in store.counts().items() if v} == actual
+
+
+def run(tasks: int, batch: int, backends: list) -> dict:
+    home = Path(tempfile.mkdtemp(prefix="omd-state-bench-"))
+    try:
+        sm = load_state_manager(home)
+        results = [bench_backend(sm, name, tasks, batch, home / "state") for name in backends]
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    return {
+        "python": sys.version.split()[0],
+        "tasks": tasks,
+        "batch": batch,
+        "single_tasks": SINGLE_TASKS,
+        "backends": results,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"task creation ({report['tasks']} tasks in batches of {report['batch']}, "
+          f"{report['single_tasks']} single, python {report['python']})")
+    print(f"\n  {'backend':8} {'batched/s':>10} {'single/s':>9} {'unique':>7} {'ascending':>10} "
+          f"{'consistent':>11}")
+    for r in report["backends"]:
+        print(f"  {r['backend']:8} {r['batched_per_s']:10d} {r['single_per_s']:9d} "
+              f"{str(r['unique']):>7} {str(r['ascending']):>10} {str(r['consistent']):>11}")
+
+
+def main():
+    args = sys.argv[1:]
+    tasks, batch, as_json = DEFAULT_TASKS, DEFAULT_BATCH, False
+    backends = ["json", "sqlite", "events"]
+    i = 0
+    while i < len(args):
+        if args[i] == "--tasks" and i + 1 < len(args):
+            tasks = max(1, int(args[i + 1]))
+            i += 1
+        elif args[i] == "--batch" and i + 1 < len(args):
+            batch = max(1, int(args[i + 1]))
+            i += 1
+        elif args[i] == "--backend" and i + 1 < len(args) and args[i + 1] in backends:
+            backends = [args[i + 1]]
+            i += 1
+        elif args[i] == "--json":
+            as_json = True
+        else:
+            print(__doc__)
+            sys.exit(1)
+        i += 1
+
+    report = run(tasks, batch, backends)
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -531,16 +531,13 @@ def cmd_cleanup(args: list[str]) -> None:
     output_json({"cleaned": True})
 
 
-def cmd_hook_complete(args: list[str]) -> None:
-    """Handle SubagentStop hook completion."""
-    input_data = load_hook_input()
-    
+def handle_hook_complete(input_data: dict) -> dict:
+    """Complete the background task that owns a finished subagent session."""
     session_id = input_data.get("session_id")
     transcript_path = input_data.get("transcript_path")
     
     if not session_id:
-        output_json({"error": "No session_id in hook input"})
-        sys.exit(0)
+        return {"error": "No session_id in hook input"}
     
     # Try to get result from transcript
     result = None
@@ -566,9 +563,20 @@ def cmd_hook_complete(args: list[str]) -> None:
     task = manager.find_by_session(session_id)
     
     if task:
-        output_json(manager.complete(task.id, result or "", error))
-    else:
-        output_json({"error": f"Task not found for session: {session_id}"})
+        return manager.complete(task.id, result or "", error)
+    return {"error": f"Task not found for session: {session_id}"}
+
+
+def handle(data: dict, command: str = "hook-complete") -> dict:
+    """In-process hook entry point (see omd_runtime.py)."""
+    if command != "hook-complete":
+        return {"error": f"Unknown hook command: {command}"}
+    return handle_hook_complete(data)
+
+
+def cmd_hook_complete(args: list[str]) -> None:
+    """Handle SubagentStop hook completion."""
+    output_json(handle_hook_complete(load_hook_input()))
 
 
 def main():
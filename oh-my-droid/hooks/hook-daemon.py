@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Hook Daemon for oh-my-droid
+
+Optional long-lived hook server on a per-user unix socket. Hosts every
+hook script in one interpreter so tool calls skip the python3 cold
+start, and keeps compiled patterns, project memory and mode states warm
+between events (see omd_cache.py).
+
+omd-dispatch.py talks to this daemon and falls back to running the
+hooks itself when the daemon is down. The daemon exits after
+OMD_HOOKD_IDLE seconds without requests (default 1800).
+
+Usage:
+    python3 hook-daemon.py start     # launch in the background
+    python3 hook-daemon.py serve     # run in the foreground
+    python3 hook-daemon.py status
+    python3 hook-daemon.py stop
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import omd_runtime
+from omd_client import SOCKET_PATH, call_daemon, decode_request
+
+IDLE_TIMEOUT_SECONDS = int(os.environ.get("OMD_HOOKD_IDLE", "1800"))
+
+
+class HookRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one request: header, payload, reply."""
+
+    def handle(self):
+        self.server.last_activity = time.time()
+        try:
+            fields, payload = decode_request(self.rfile.read())
+        except ValueError:
+            fields, payload = [], b""
+
+        reply = self.server.dispatch(fields, payload.decode("utf-8", "replace"))
+        self.wfile.write(reply.encode())
+        self.server.requests_served += 1
+        self.server.last_activity = time.time()
+
+
+class HookServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        super().__init__(path, HookRequestHandler)
+        self.started_at = time.time()
+        self.last_activity = time.time()
+        self.requests_served = 0
+
+    def dispatch(self, fields: list, input_str: str) -> str:
+        op = fields[0] if fields else ""
+        cwd = fields[1] if len(fields) > 1 else ""
+
+        if op == "ping":
+            return json.dumps(self.status())
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return json.dumps({"stopping": True})
+        if op not in ("hook", "event") or len(fields) < 3:
+            return json.dumps(omd_runtime.SUPPRESS)
+
+        data = omd_runtime.parse_payload(input_str)
+        # Handlers fall back to os.getcwd(), which must be the client's cwd
+        if "cwd" not in data and "directory" not in data and cwd:
+            data["cwd"] = cwd
+
+        if op == "event":
+            return json.dumps(omd_runtime.dispatch_event(fields[2], data))
+        if fields[2] not in omd_runtime.HOOKS:
+            return json.dumps(omd_runtime.SUPPRESS)
+        return json.dumps(omd_runtime.run_handler(fields[2], data, fields[3:]))
+
+    def status(self) -> dict:
+        return {
+            "running": True,
+            "pid": os.getpid(),
+            "socket": SOCKET_PATH,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "requests_served": self.requests_served,
+            "hooks_loaded": sorted(omd_runtime._modules),
+        }
+
+
+def _watch_idle(server: HookServer) -> None:
+    while True:
+        time.sleep(min(60, max(1, IDLE_TIMEOUT_SECONDS)))
+        if time.time() - server.last_activity > IDLE_TIMEOUT_SECONDS:
+            server.shutdown()
+            return
+
+
+def _claim_socket() -> bool:
+    """Remove a stale socket file. Returns False if a daemon is alive."""
+    if not os.path.exists(SOCKET_PATH):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(SOCKET_PATH)
+        return False
+    except OSError:
+        Path(SOCKET_PATH).unlink(missing_ok=True)
+        return True
+    finally:
+        probe.close()
+
+
+def output_json(data: dict) -> None:
+    """Output JSON to stdout"""
+    print(json.dumps(data, indent=2))
+
+
+def cmd_serve(args: list) -> None:
+    """Run the daemon in the foreground"""
+    Path(SOCKET_PATH).parent.mkdir(parents=True, exist_ok=True)
+    if not _claim_socket():
+        output_json({"error": "Daemon already running", "socket": SOCKET_PATH})
+        sys.exit(1)
+
+    old_umask = os.umask(0o077)
+    try:
+        server = HookServer(SOCKET_PATH)
+    finally:
+        os.umask(old_umask)
+
+    # Warm every hook module up front so the first event is fast too
+    for name in omd_runtime.HOOKS:
+        try:
+            omd_runtime.load_hook(name)
+        except Exception:
+            pass
+
+    if IDLE_TIMEOUT_SECONDS > 0:
+        threading.Thread(target=_watch_idle, args=(server,), daemon=True).start()
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        Path(SOCKET_PATH).unlink(missing_ok=True)
+
+
+def cmd_start(args: list) -> None:
+    """Launch the daemon in the background"""
+    reply = call_daemon(["ping"])
+    if reply:
+        output_json(json.loads(reply))
+        return
+
+    omd_runtime.start_daemon()
+    for _ in range(50):
+        time.sleep(0.05)
+        reply = call_daemon(["ping"])
+        if reply:
+            output_json(json.loads(reply))
+            return
+    output_json({"running": False, "error": "Daemon did not start"})
+    sys.exit(1)
+
+
+def cmd_status(args: list) -> None:
+    """Show daemon status"""
+    reply = call_daemon(["ping"])
+    output_json(json.loads(reply) if reply else {"running": False, "socket": SOCKET_PATH})
+
+
+def cmd_stop(args: list) -> None:
+    """Stop the daemon"""
+    reply = call_daemon(["shutdown"])
+    output_json({"stopped": bool(reply)})
+
+
+def main():
+    """CLI entry point"""
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    args = sys.argv[2:]
+
+    commands = {
+        "serve": cmd_serve,
+        "start": cmd_start,
+        "status": cmd_status,
+        "stop": cmd_stop,
+    }
+
+    if command in commands:
+        commands[command](args)
+    else:
+        output_json({"error": f"Unknown command: {command}", "available": list(commands.keys())})
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,65 @@ Intelligent Router for oh-my-droid
 
 Analyzes tasks using droid exec and routes to appropriate droid.
 Hybrid approach: AI analysis (primary) + Keyword fallback (secondary).
+Decisions are cached on disk (see omd_route_cache.py), and a local model
+trained on past AI decisions answers first when it is confident (see
+omd_route_model.py).
+
+With --deadline (or OMD_ROUTER_DEADLINE) the AI analysis runs in a
+detached worker: if it has not answered in time the keyword routing is
+returned, and the worker still caches its late answer (--no-late kills
+it instead).
+
+--batch routes one prompt per JSONL line (a JSON string or an object with
+"prompt" and optional "id") using one droid exec call for up to 30
+prompts, and prints one JSON routing per line.
+
+Usage:
+    intelligent-router.py [--no-cache] [--no-model] [--deadline SECONDS]
+                          [--no-late] [--objective cost|latency|quality] "<task>"
+    intelligent-router.py --batch [FILE.jsonl]    (stdin if no file)
+    intelligent-router.py --cache-stats
+    intelligent-router.py --clear-cache
+    intelligent-router.py --model-stats
+    intelligent-router.py --outcome-stats
+    intelligent-router.py --stats [--since MINUTES]
+
+Every droid exec analysis is recorded (latency, return code, outcome,
+droid; see omd_route_stats.py); `--stats` reports latency percentiles,
+timeout and parse failure rates and the droid distribution. The
+analysis timeout adapts to recent latencies instead of a fixed 120s.
+droid exec output is scanned as it streams and the process is stopped
+once a routing object naming a known droid is complete.
+
+Prompts that are near-duplicates of a routed one (same words apart from
+file names, numbers or a little rewording) reuse its decision with a
+discounted confidence (see omd_route_similar.py).
+
+--objective (or OMD_ROUTER_OBJECTIVE) swaps the chosen execution tier for
+the cheapest, fastest or most reliable one on similar tasks, using the
+outcomes state-manager.py records (see omd_route_outcomes.py).
 """
 
+import codecs
+import hashlib
+import os
+import select
+import signal
 import subprocess
 import json
+import math
+import re
 import sys
+import time
 from typing import Optional
 
+import omd_route_cache
+import omd_route_model
+import omd_route_outcomes
+import omd_route_similar
+import omd_route_stats
+import omd_singleflight
+
 # Available droids and capabilities
 DROIDS = {
     "basic-searcher": "Search code/files (low complexity)",
@@ -28,18 +80,84 @@ DROIDS = {
     "orchestrator": "Task orchestration",
 }
 
+# Changes whenever DROIDS does, so cached decisions for a different
+# droid table are never reused
+DROIDS_VERSION = hashlib.sha256(
+    json.dumps(DROIDS, sort_keys=True).encode()
+).hexdigest()[:12]
+
 # Keyword-based routing (fallback)
-KEYWORD_DROIDS = {
-    "search|find|list": "basic-searcher",
-    "read|explain|show": "basic-reader",
-    "debug|fix|refactor": "executor-med",
-    "build|implement|create|write": "executor-med",
-    "review|audit|check": "code-reviewer",
-    "verify|validate|test": "verifier",
-    "architecture|design|system|api": "hephaestus",
-    "complex|architecture|microservices": "executor-high",
+# Droid -> {keyword: weight}. Keywords match whole words (plus plain
+# -s/-es/-d/-ed/-ing endings); multi-word keywords match across any
+# whitespace, and a longer keyword wins over a shorter one it contains.
+# Negative weights count against a droid.
+KEYWORD_WEIGHTS = {
+    "basic-searcher": {"search": 1.0, "find": 1.0, "list": 0.8, "locate": 1.0,
+                       "grep": 1.0, "where is": 0.8, "fix": -0.5, "implement": -0.5},
+    "basic-reader": {"read": 1.0, "explain": 1.0, "show": 0.6, "what does": 0.8,
+                     "fix": -0.5, "implement": -0.5},
+    "executor-low": {"rename": 0.8, "typo": 1.0, "simple": 0.5, "small": 0.4},
+    "executor-med": {"debug": 1.0, "debugging": 1.0, "fix": 1.0, "refactor": 1.0,
+                     "build": 0.6, "implement": 1.0, "create": 0.8, "creating": 0.8,
+                     "write": 0.6, "writing": 0.6, "bug": 0.6},
+    "executor-high": {"complex": 1.0, "architecture": 0.6, "microservices": 1.0,
+                      "migration": 0.8, "rewrite": 0.8},
+    "hephaestus": {"architecture": 1.0, "design": 0.8, "system": 0.5, "api": 0.5,
+                   "from scratch": 1.0},
+    "code-reviewer": {"review": 1.2, "audit": 1.0, "check": 0.5, "code smell": 1.0},
+    "verifier": {"verify": 1.0, "validate": 1.0, "test": 0.6, "write tests": -1.0,
+                 "add tests": -1.0},
+    "test-engineer": {"write tests": 1.5, "add tests": 1.5, "unit tests": 1.0,
+                      "test coverage": 1.2},
+    "security-auditor": {"security": 1.2, "vulnerability": 1.2, "vulnerabilities": 1.2,
+                         "cve": 1.2, "injection": 1.0},
 }
 
+# Autonomy implied by a keyword-routed droid (see ROUTING_RULES)
+KEYWORD_AUTONOMY = {
+    "basic-searcher": "low",
+    "basic-reader": "low",
+    "executor-low": "low",
+    "executor-high": "high",
+    "hephaestus": "high",
+}
+
+
+def compile_keyword_scorer(weights: dict) -> tuple:
+    """One regex over every keyword, and keyword -> [(droid, weight)]"""
+    table = {}
+    for droid, keywords in weights.items():
+        for keyword, weight in keywords.items():
+            table.setdefault(" ".join(keyword.lower().split()), []).append((droid, weight))
+    alternatives = [
+        r"\s+".join(re.escape(word) for word in keyword.split())
+        for keyword in sorted(table, key=len, reverse=True)
+    ]
+    regex = re.compile(
+        r"\b(" + "|".join(alternatives) + r")(?:s|es|d|ed|ing)?\b", re.IGNORECASE
+    )
+    return regex, table
+
+
+KEYWORD_RE, KEYWORD_TABLE = compile_keyword_scorer(KEYWORD_WEIGHTS)
+
+ROUTING_RULES = """Rules:
+1. Choose droid based on task complexity
+2. Simple search/read tasks → basic-* droids (autonomy: low)
+3. Simple implementation → executor-low (autonomy: low)
+4. Standard implementation/fix → executor-med (autonomy: medium)
+5. Complex implementation → executor-high (autonomy: high)
+6. Very complex architecture/build → hephaestus (autonomy: high)
+7. Review tasks → code-reviewer
+8. Verification → verifier
+"""
+
+# Concurrent analyses of the same prompt are coalesced here
+INFLIGHT_DIR = omd_route_cache.ROUTER_DIR / "inflight"
+
+# Tasks per droid exec call in route_batch
+MAX_BATCH = 30
+
 # Default routing result
 DEFAULT_ROUTING = {
     "droid": "executor-med",
@@ -56,31 +174,164 @@ ROUTER_ERROR = {
 }
 
 
+def score_keywords(prompt: str) -> tuple:
+    """Score every droid in one pass; returns (ranked [(droid, score)], matched keywords)"""
+    matched = {" ".join(m.group(1).lower().split()) for m in KEYWORD_RE.finditer(prompt)}
+    scores = {}
+    for keyword in matched:
+        for droid, weight in KEYWORD_TABLE[keyword]:
+            scores[droid] = scores.get(droid, 0.0) + weight
+    ranked = sorted(
+        ((d, round(v, 3)) for d, v in scores.items() if v > 0),
+        key=lambda item: (-item[1], item[0]),
+    )
+    return ranked, sorted(matched)
+
+
 def route_by_keywords(prompt: str) -> Optional[dict]:
-    """Route based on keyword matching (fallback)"""
-    prompt_lower = prompt.lower()
+    """
+    Route based on weighted keyword matching (fallback).
 
-    for pattern, droid in KEYWORD_DROIDS.items():
-        if any(kw in prompt_lower for kw in pattern.split('|')):
-            return {
-                "droid": droid,
-                "autonomy": "medium",
-                "confidence": 0.6,
-                "reason": f"Keyword matched: {pattern}"
-            }
+    Confidence is the top droid's share of all positive scores, scaled by
+    how much evidence it has (1 - e^-score): one weight-1.0 keyword alone
+    gives 0.63, two give 0.86, and a tie between two droids halves it.
+    """
+    ranked, matched = score_keywords(prompt)
+    if not ranked:
+        return None
+
+    droid, top = ranked[0]
+    share = top / sum(score for _, score in ranked)
+    confidence = round(share * (1 - math.exp(-top)), 2)
+    return {
+        "droid": droid,
+        "autonomy": KEYWORD_AUTONOMY.get(droid, "medium"),
+        "confidence": confidence,
+        "reason": f"Keyword matched: {', '.join(matched)}",
+        "candidates": [{"droid": d, "score": score} for d, score in ranked],
+    }
+
+
+class JsonObjectScanner:
+    """
+    Incremental scanner for JSON objects in streamed text. feed() returns
+    the text of every object closed by the chunk, innermost first, so an
+    answer is found however it is wrapped or spread over lines. Only the
+    text of currently open objects is kept, up to max_chars.
+    """
+
+    def __init__(self, max_chars: int = 65536):
+        self.max_chars = max_chars
+        self.text = ""
+        self.starts = []
+        self.in_string = False
+        self.escaped = False
 
+    def feed(self, chunk: str) -> list:
+        found = []
+        if self.starts:
+            i = len(self.text)
+            self.text += chunk
+        else:
+            i = 0
+            self.text = chunk
+        text = self.text
+        while i < len(text):
+            if not self.starts:
+                # Outside any object: skip prose up to the next brace
+                i = text.find('{', i)
+                if i == -1:
+                    break
+                self.starts.append(i)
+                self.in_string = self.escaped = False
+            else:
+                c = text[i]
+                if self.in_string:
+                    if self.escaped:
+                        self.escaped = False
+                    elif c == '\\':
+                        self.escaped = True
+                    elif c == '"':
+                        self.in_string = False
+                elif c == '"':
+                    self.in_string = True
+                elif c == '{':
+                    self.starts.append(i)
+                elif c == '}':
+                    found.append(text[self.starts.pop():i + 1])
+            i += 1
+
+        if not self.starts:
+            self.text = ""
+        elif len(text) - self.starts[0] > self.max_chars:
+            # An unclosed brace in prose; give up on it
+            self.text, self.starts = "", []
+        else:
+            first = self.starts[0]
+            self.text = text[first:]
+            self.starts = [start - first for start in self.starts]
+        return found
+
+
+def parse_routing(candidate: str) -> Optional[dict]:
+    """candidate as a routing dict naming a known droid, or None"""
+    try:
+        parsed = json.loads(candidate)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(parsed, dict) and parsed.get('droid') in DROIDS:
+        return parsed
     return None
 
 
-def route_by_ai(prompt: str) -> dict:
-    """Route using AI analysis via droid exec"""
+def stream_routing(command: list, timeout: float) -> tuple:
+    """
+    Run command, scanning its stdout for a routing object as it arrives.
+    Returns (routing or None, returncode); the process is stopped as soon
+    as a routing is found, in which case returncode is None unless it had
+    already exited. Raises subprocess.TimeoutExpired.
+    """
+    proc = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    scanner = JsonObjectScanner()
+    end = time.monotonic() + timeout
+    fd = proc.stdout.fileno()
+    try:
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(command, timeout)
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(fd, 65536)
+            for candidate in scanner.feed(decoder.decode(chunk, final=not chunk)):
+                routing = parse_routing(candidate)
+                if routing:
+                    return routing, proc.poll()
+            if not chunk:
+                return None, proc.wait(timeout=max(end - time.monotonic(), 0.01))
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+def droid_catalog() -> str:
+    return chr(10).join([f"{k}: {v}" for k, v in DROIDS.items()])
+
+
+def analyze_with_ai(prompt: str) -> Optional[dict]:
+    """Ask droid exec for a routing; None without a valid answer"""
     analysis_prompt = f'''
 Analyze the task and output ONLY valid JSON:
 
 Task: "{prompt}"
 
 Available droids:
-{chr(10).join([f"{k}: {v}" for k, v in DROIDS.items()])}
+{droid_catalog()}
 
 Output JSON format:
 {{
@@ -90,38 +341,39 @@ Output JSON format:
     "reason": "brief explanation of why this droid was chosen"
 }}
 
-Rules:
-1. Choose droid based on task complexity
-2. Simple search/read tasks → basic-* droids (autonomy: low)
-3. Simple implementation → executor-low (autonomy: low)
-4. Standard implementation/fix → executor-med (autonomy: medium)
-5. Complex implementation → executor-high (autonomy: high)
-6. Very complex architecture/build → hephaestus (autonomy: high)
-7. Review tasks → code-reviewer
-8. Verification → verifier
-'''
+{ROUTING_RULES}'''
 
+    started = time.monotonic()
     try:
-        result = subprocess.run([
-            'droid', 'exec', '--auto', 'low', '--', analysis_prompt
-        ], capture_output=True, text=True, timeout=120)
-
-        if result.returncode == 0:
-            # Parse JSON from output
-            output = result.stdout.strip()
-            for line in output.split('\n'):
-                if '{' in line:
-                    try:
-                        json_start = line.index('{')
-                        parsed = json.loads(line[json_start:])
-                        # Validate droid name
-                        if parsed.get('droid') in DROIDS:
-                            return parsed
-                    except (json.JSONDecodeError, KeyError):
-                        pass
+        parsed, returncode = stream_routing(
+            ['droid', 'exec', '--auto', 'low', '--', analysis_prompt],
+            omd_route_stats.adaptive_timeout(),
+        )
+    except subprocess.TimeoutExpired:
+        omd_route_stats.record(time.monotonic() - started, None, "timeout")
+        raise
+    except Exception:
+        omd_route_stats.record(time.monotonic() - started, None, "error")
+        raise
+    latency = time.monotonic() - started
+
+    if parsed:
+        omd_route_stats.record(latency, returncode, "ok", parsed['droid'])
+        return parsed
+    omd_route_stats.record(latency, returncode,
+                           "parse-failed" if returncode == 0 else "exit-error")
+    return None
+
+
+def route_by_ai_checked(prompt: str) -> tuple:
+    """route_by_ai, plus whether the result came from a valid AI answer"""
+    try:
+        parsed = analyze_with_ai(prompt)
+        if parsed:
+            return parsed, True
 
         # If AI analysis fails, return default
-        return DEFAULT_ROUTING.copy()
+        return DEFAULT_ROUTING.copy(), False
 
     except subprocess.TimeoutExpired:
         return {
@@ -129,22 +381,107 @@ Rules:
             "autonomy": "medium",
             "confidence": 0.3,
             "reason": "AI analysis timed out - using default"
-        }
+        }, False
     except Exception as e:
         return {
             "droid": "executor-med",
             "autonomy": "medium",
             "confidence": 0.0,
             "reason": f"Router error: {str(e)[:50]}"
-        }
+        }, False
 
 
-def route(prompt: str) -> dict:
-    """Main routing function - tries AI first, falls back to keywords"""
-    # Try AI-based routing first
-    ai_result = route_by_ai(prompt)
+def route_by_ai(prompt: str) -> dict:
+    """Route using AI analysis via droid exec"""
+    return route_by_ai_checked(prompt)[0]
+
+
+def extract_json_array(output: str) -> list:
+    """First JSON array in output (the model may wrap it in prose)"""
+    decoder = json.JSONDecoder()
+    start = output.find('[')
+    while start != -1:
+        try:
+            value, _ = decoder.raw_decode(output, start)
+            if isinstance(value, list):
+                return value
+        except json.JSONDecodeError:
+            pass
+        start = output.find('[', start + 1)
+    return []
+
+
+def normalize_answer(entry: dict) -> dict:
+    """Routing fields of one batch answer, with defaults for missing ones"""
+    try:
+        confidence = min(max(float(entry.get('confidence', 0.5)), 0.0), 1.0)
+    except (TypeError, ValueError):
+        confidence = 0.5
+    return {
+        "droid": entry['droid'],
+        "autonomy": entry.get('autonomy') if entry.get('autonomy') in ("low", "medium", "high") else "medium",
+        "confidence": confidence,
+        "reason": str(entry.get('reason', "Batch AI analysis")),
+    }
+
+
+def analyze_batch_with_ai(prompts: list) -> list:
+    """
+    Ask droid exec to route several tasks in one call. Returns one entry
+    per prompt: a routing dict, or None where the answer was missing or
+    named an unknown droid.
+    """
+    tasks = chr(10).join(f"{i}. {json.dumps(p)}" for i, p in enumerate(prompts, 1))
+    analysis_prompt = f'''
+Analyze each numbered task and output ONLY a valid JSON array with one object per task:
+
+Tasks:
+{tasks}
+
+Available droids:
+{droid_catalog()}
+
+Output JSON format:
+[
+    {{
+        "task": 1,
+        "droid": "basic-searcher|basic-reader|executor-low|executor-med|executor-high|hephaestus|code-reviewer|verifier",
+        "autonomy": "low|medium|high",
+        "confidence": 0.0-1.0,
+        "reason": "brief explanation of why this droid was chosen"
+    }}
+]
+
+{ROUTING_RULES}'''
+
+    answers = [None] * len(prompts)
+    started = time.monotonic()
+    try:
+        result = subprocess.run([
+            'droid', 'exec', '--auto', 'low', '--', analysis_prompt
+        ], capture_output=True, text=True, timeout=omd_route_stats.MAX_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        omd_route_stats.record(time.monotonic() - started, None, "timeout", kind="batch")
+        raise
+    latency = time.monotonic() - started
+    if result.returncode != 0:
+        omd_route_stats.record(latency, result.returncode, "exit-error", kind="batch")
+        return answers
+
+    for position, entry in enumerate(extract_json_array(result.stdout), 1):
+        if not isinstance(entry, dict) or entry.get('droid') not in DROIDS:
+            continue
+        index = entry.get('task', position)
+        if isinstance(index, int) and 1 <= index <= len(prompts) and answers[index - 1] is None:
+            answers[index - 1] = normalize_answer(entry)
+    found = [a['droid'] for a in answers if a]
+    omd_route_stats.record(latency, 0, "ok" if found else "parse-failed",
+                           max(found, key=found.count) if found else "", kind="batch")
+    return answers
+
 
-    # If AI has low confidence, supplement with keyword matching
+def combine(ai_result: dict, prompt: str) -> dict:
+    """If AI has low confidence, supplement with keyword matching"""
     if ai_result['confidence'] < 0.7:
         keyword_result = route_by_keywords(prompt)
         if keyword_result:
@@ -159,6 +496,290 @@ def route(prompt: str) -> dict:
     return ai_result
 
 
+def similar_index() -> omd_route_similar.SimilarIndex:
+    return omd_route_similar.SimilarIndex(DROIDS_VERSION)
+
+
+def route_by_similar(prompt: str) -> Optional[dict]:
+    """Decision for a near-duplicate of a past prompt, or None"""
+    if not omd_route_similar.enabled():
+        return None
+    try:
+        similar = similar_index().lookup(prompt, list(DROIDS))
+    except (OSError, ValueError):
+        return None
+    if similar:
+        omd_route_cache.bump("similar_hits")
+    return similar
+
+
+def record_routing(prompt: str, routing: dict, ai_result: dict) -> None:
+    """Cache a decision backed by a valid AI answer and train on it"""
+    omd_route_cache.put(omd_route_cache.cache_key(prompt, DROIDS_VERSION), routing)
+    if omd_route_similar.enabled():
+        try:
+            similar_index().add(prompt, routing, list(DROIDS))
+        except (OSError, ValueError):
+            pass
+    if ai_result['confidence'] >= 0.7:
+        omd_route_model.learn(prompt, ai_result, DROIDS_VERSION)
+
+
+def analyze_and_record(prompt: str) -> tuple:
+    """
+    AI routing combined with keywords; records valid answers for reuse.
+    Concurrent calls for the same normalized prompt share one analysis.
+    """
+    def analyze():
+        ai_result, ai_ok = route_by_ai_checked(prompt)
+        routing = combine(ai_result, prompt)
+
+        # Only real AI answers are recorded; timeouts and errors retry next time
+        if ai_ok:
+            record_routing(prompt, routing, ai_result)
+        return [routing, ai_ok]
+
+    key = omd_route_cache.cache_key(prompt, DROIDS_VERSION)
+    # Wait as long as the leader's analysis may take, whatever its timeout
+    routing, ai_ok = omd_singleflight.run(INFLIGHT_DIR, key, analyze,
+                                          omd_route_stats.MAX_TIMEOUT + 5)
+    return routing, ai_ok
+
+
+def route_with_deadline(prompt: str, deadline: float, record_late: bool = True) -> Optional[dict]:
+    """
+    Run the AI analysis in a detached worker and wait up to deadline
+    seconds for its answer. Returns None when it is late; the worker then
+    keeps running and caches its answer (unless record_late is False, in
+    which case it is killed).
+    """
+    try:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        proc.stdin.write(prompt.encode("utf-8", "replace"))
+        proc.stdin.close()
+    except Exception:
+        return None
+
+    ready, _, _ = select.select([proc.stdout], [], [], max(deadline, 0.0))
+    if ready:
+        try:
+            routing = json.loads(proc.stdout.readline())
+            if routing.get('droid') in DROIDS:
+                return routing
+        except (json.JSONDecodeError, AttributeError, OSError):
+            pass
+    elif not record_late:
+        try:
+            # The worker leads its own session; take droid exec down with it
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+    proc.stdout.close()
+    return None
+
+
+def deadline_fallback(prompt: str, deadline: float) -> dict:
+    """Keyword routing (or the default) when the AI answer is late"""
+    note = f"AI analysis exceeded {deadline:g}s deadline"
+    keyword_result = route_by_keywords(prompt)
+    if keyword_result:
+        return dict(keyword_result, reason=f"{keyword_result['reason']} ({note})")
+    return dict(DEFAULT_ROUTING, reason=f"{note} - using default")
+
+
+def default_deadline() -> Optional[float]:
+    try:
+        value = float(os.environ.get("OMD_ROUTER_DEADLINE", ""))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def route_locally(prompt: str, use_cache: bool = True, use_model: bool = True) -> Optional[dict]:
+    """Cached (or near-duplicate) decision or confident local model answer, without calling AI"""
+    if use_cache:
+        cached = omd_route_cache.get(omd_route_cache.cache_key(prompt, DROIDS_VERSION))
+        if cached:
+            return dict(cached, cached=True)
+        similar = route_by_similar(prompt)
+        if similar:
+            return similar
+
+    # A confident local model answer skips the AI call
+    if use_model:
+        predicted = omd_route_model.predict(prompt, DROIDS_VERSION)
+        if predicted:
+            return predicted
+    return None
+
+
+def apply_objective(routing: dict, prompt: str, objective: Optional[str]) -> dict:
+    """
+    Swap an execution tier for the one past outcomes favour under
+    objective (cost, latency or quality); other droids are kept.
+    """
+    if not objective:
+        return routing
+    choice = omd_route_outcomes.choose_tier(prompt, objective, routing.get('droid'))
+    if not choice:
+        return routing
+    return dict(
+        routing,
+        droid=choice['droid'],
+        reason=f"{routing.get('reason', '')} | {objective}: {choice['droid']} succeeded on "
+               f"{choice['success_rate']:.0%} of {choice['tasks']} {choice['category']} tasks",
+    )
+
+
+def default_objective() -> Optional[str]:
+    objective = os.environ.get("OMD_ROUTER_OBJECTIVE", "")
+    return objective if objective in omd_route_outcomes.OBJECTIVES else None
+
+
+def route(prompt: str, use_cache: bool = True, use_model: bool = True,
+          deadline: Optional[float] = None, record_late: bool = True,
+          objective: Optional[str] = None) -> dict:
+    """
+    Main routing function - tries AI first, falls back to keywords.
+
+    With a deadline the AI analysis runs concurrently and the keyword
+    routing is returned if it has not answered in time. With an objective
+    the chosen execution tier may be swapped using recorded outcomes.
+    """
+    local = route_locally(prompt, use_cache, use_model)
+    if local:
+        return apply_objective(local, prompt, objective)
+
+    if deadline is not None:
+        routing = route_with_deadline(prompt, deadline, record_late)
+        return apply_objective(routing or deadline_fallback(prompt, deadline), prompt, objective)
+
+    # Try AI-based routing first
+    return apply_objective(analyze_and_record(prompt)[0], prompt, objective)
+
+
+def route_batch(prompts: list, use_cache: bool = True, use_model: bool = True,
+                objective: Optional[str] = None) -> list:
+    """
+    Route many prompts with one droid exec call per MAX_BATCH unresolved
+    prompts. Each prompt without a valid answer falls back on its own
+    (keyword match or default), as route() does.
+    """
+    results = [route_locally(p, use_cache, use_model) for p in prompts]
+
+    # Identical prompts (after normalization) are analyzed once
+    pending = {}
+    for i, prompt in enumerate(prompts):
+        if results[i] is None:
+            key = omd_route_cache.cache_key(prompt, DROIDS_VERSION)
+            pending.setdefault(key, []).append(i)
+    groups = list(pending.values())
+
+    for start in range(0, len(groups), MAX_BATCH):
+        chunk = groups[start:start + MAX_BATCH]
+        fallback = DEFAULT_ROUTING
+        try:
+            answers = analyze_batch_with_ai([prompts[g[0]] for g in chunk])
+        except subprocess.TimeoutExpired:
+            answers = [None] * len(chunk)
+            fallback = dict(DEFAULT_ROUTING, confidence=0.3,
+                            reason="AI analysis timed out - using default")
+        except Exception as e:
+            answers = [None] * len(chunk)
+            fallback = dict(DEFAULT_ROUTING, confidence=0.0,
+                            reason=f"Router error: {str(e)[:50]}")
+
+        for group, answer in zip(chunk, answers):
+            prompt = prompts[group[0]]
+            routing = combine(answer or dict(fallback), prompt)
+            if answer:
+                record_routing(prompt, routing, answer)
+            for i in group:
+                results[i] = dict(routing)
+    return [apply_objective(r, p, objective) for r, p in zip(results, prompts)]
+
+
+def read_batch(lines) -> list:
+    """(id, prompt) pairs from JSONL: strings or {"id": ..., "prompt": ...}"""
+    items = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError:
+            value = line
+        if isinstance(value, dict):
+            items.append((value.get('id', number), str(value.get('prompt', ''))))
+        else:
+            items.append((number, str(value)))
+    return items
+
+
+def run_batch(path: str, use_cache: bool, use_model: bool,
+              objective: Optional[str] = None) -> None:
+    """--batch: route JSONL prompts from a file (or stdin), print JSONL"""
+    if path in ("", "-"):
+        items = read_batch(sys.stdin)
+    else:
+        with open(path, encoding="utf-8") as f:
+            items = read_batch(f)
+    routings = route_batch([p for _, p in items], use_cache, use_model, objective)
+    for (item_id, _), routing in zip(items, routings):
+        print(json.dumps(dict(routing, id=item_id)))
+
+
+def run_worker() -> None:
+    """--worker: analyze the prompt on stdin, record and print the result"""
+    prompt = sys.stdin.read()
+    routing, _ = analyze_and_record(prompt)
+    try:
+        print(json.dumps(routing), flush=True)
+    except (BrokenPipeError, OSError):
+        # The caller's deadline passed; the answer is already recorded
+        pass
+
+
+def parse_options(args: list) -> dict:
+    opts = {"cache": True, "model": True, "deadline": default_deadline(),
+            "late": os.environ.get("OMD_ROUTER_RECORD_LATE", "1") != "0",
+            "batch": None, "objective": default_objective(), "prompt": []}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--no-cache":
+            opts["cache"] = False
+        elif arg == "--no-model":
+            opts["model"] = False
+        elif arg == "--no-late":
+            opts["late"] = False
+        elif arg == "--batch":
+            # Optional file argument; stdin otherwise
+            has_path = i + 1 < len(args) and not args[i + 1].startswith("--")
+            opts["batch"] = args[i + 1] if has_path else "-"
+            i += 1 if has_path else 0
+        elif arg == "--objective" and i + 1 < len(args):
+            if args[i + 1] not in omd_route_outcomes.OBJECTIVES:
+                raise SystemExit(f"--objective must be one of: {', '.join(omd_route_outcomes.OBJECTIVES)}")
+            opts["objective"] = args[i + 1]
+            i += 1
+        elif arg == "--deadline" and i + 1 < len(args):
+            try:
+                opts["deadline"] = max(float(args[i + 1]), 0.0)
+            except ValueError:
+                raise SystemExit("--deadline must be a number of seconds")
+            i += 1
+        else:
+            opts["prompt"].append(arg)
+        i += 1
+    return opts
+
+
 def main():
     """CLI entry point"""
     if len(sys.argv) < 2:
@@ -166,13 +787,54 @@ def main():
         print(json.dumps({
             "version": "1.0.0",
             "available_droids": DROIDS,
-            "usage": "intelligent-router.py \"<task>\""
+            "usage": "intelligent-router.py [--no-cache] [--no-model] "
+                     "[--deadline SECONDS] [--no-late] "
+                     "[--objective cost|latency|quality] \"<task>\""
         }, indent=2))
         sys.exit(0)
 
+    args = sys.argv[1:]
+    if args[0] == "--worker":
+        run_worker()
+        return
+    if args[0] == "--cache-stats":
+        stats = omd_route_cache.counters()
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 3) if lookups else 0.0
+        stats["similar_entries"] = similar_index().count()
+        print(json.dumps(stats, indent=2))
+        return
+    if args[0] == "--clear-cache":
+        omd_route_similar.clear()
+        print(json.dumps({"removed": omd_route_cache.clear()}, indent=2))
+        return
+    if args[0] == "--model-stats":
+        print(json.dumps(omd_route_model.summary(DROIDS_VERSION), indent=2))
+        return
+    if args[0] == "--outcome-stats":
+        print(json.dumps(omd_route_outcomes.summary(), indent=2))
+        return
+    # A bare "stats" too, but "stats page is slow" is a prompt
+    if args[0] == "--stats" or args == ["stats"]:
+        since = None
+        if args[1:2] == ["--since"] and len(args) > 2:
+            try:
+                since = float(args[2])
+            except ValueError:
+                raise SystemExit("--since must be a number of minutes")
+        print(json.dumps(omd_route_stats.report(since), indent=2))
+        return
+
+    opts = parse_options(args)
+    if opts["batch"] is not None:
+        run_batch(opts["batch"], opts["cache"], opts["model"], opts["objective"])
+        return
+
     # Just route and output result
-    prompt = ' '.join(sys.argv[1:])
-    routing = route(prompt)
+    prompt = ' '.join(opts["prompt"])
+    routing = route(prompt, use_cache=opts["cache"], use_model=opts["model"],
+                    deadline=opts["deadline"], record_late=opts["late"],
+                    objective=opts["objective"])
     print(json.dumps(routing, indent=2))
 
 
@@ -14,15 +14,20 @@ Supported keywords (priority order):
 6. pipeline: Sequential staged execution
 7. plan: Planning mode
 8. research: Research orchestration
+
+Families, priorities and conflict rules can be extended per user or
+project with keywords.json (see omd_keywords.py).
 """
 
 import json
 import sys
 import re
 import os
-from pathlib import Path
 from datetime import datetime
 
+import omd_keywords
+import omd_modes
+
 
 def read_stdin():
     try:
@@ -31,9 +36,8 @@ def read_stdin():
         return ""
 
 
-def extract_prompt(input_str):
+def extract_prompt(data):
     try:
-        data = json.loads(input_str)
         if "prompt" in data:
             return data["prompt"]
         if "message" in data and "content" in data["message"]:
@@ -43,56 +47,111 @@ def extract_prompt(input_str):
         return ""
 
 
-def sanitize_for_detection(text):
-    text = re.sub(r"```[\s\S]*?```", "", text)
-    text = re.sub(r"`[^`]+`", "", text)
-    text = re.sub(r"https?://\S+", "", text)
-    return text
+# Prompts longer than twice this many characters are only scanned in
+# their first and last OMD_KEYWORD_WINDOW characters (0 scans everything).
+DEFAULT_SCAN_WINDOW = 65536
 
+# Where a skipped region (code span or URL) may start
+SKIP_START_RE = re.compile(r"`+|https?://")
+WHITESPACE_RE = re.compile(r"\s")
 
-def activate_state(directory, prompt, state_name, session_id=""):
-    state = {
+
+def scan_window():
+    try:
+        return max(0, int(os.environ.get("OMD_KEYWORD_WINDOW", DEFAULT_SCAN_WINDOW)))
+    except ValueError:
+        return DEFAULT_SCAN_WINDOW
+
+
+def scan_ranges(length, window):
+    """(start, end) ranges of a prompt to scan: all of it, or head and tail."""
+    if not window or length <= 2 * window:
+        return [(0, length)]
+    return [(0, window), (length - window, length)]
+
+
+def detection_segments(text, start, end):
+    """
+    Yield (start, end) spans of text[start:end] outside fenced code blocks,
+    inline code and URLs.
+
+    One left-to-right pass that never copies the text. A closing fence is
+    searched for at most once past the last failed search, so unbalanced
+    fences or backticks keep the scan linear.
+    """
+    pos = start
+    fence_missing_from = end  # no closing ``` at or after this offset
+    while pos < end:
+        m = SKIP_START_RE.search(text, pos, end)
+        if not m:
+            break
+        if m.start() > pos:
+            yield pos, m.start()
+        token_end = m.end()
+
+        if text[m.start()] != "`":
+            # URL: skip to the next whitespace
+            ws = WHITESPACE_RE.search(text, token_end, end)
+            pos = ws.start() if ws else end
+            continue
+
+        if token_end - m.start() >= 3 and token_end < fence_missing_from:
+            close = text.find("```", token_end, end)
+            if close != -1:
+                pos = close + 3
+                continue
+            fence_missing_from = token_end
+
+        # Inline code runs from the last backtick of the run to the next one
+        close = text.find("`", token_end, end)
+        pos = close + 1 if close > token_end else token_end
+    if pos < end:
+        yield pos, end
+
+
+def detect_keywords(text, window=None, table=None):
+    """Return one match per keyword family found in text, in priority order."""
+    if window is None:
+        window = scan_window()
+    if table is None:
+        table = omd_keywords.load_table()
+    if table.regex is None:
+        return []
+    found = set()
+    for range_start, range_end in scan_ranges(len(text), window):
+        for seg_start, seg_end in detection_segments(text, range_start, range_end):
+            for m in table.regex.finditer(text, seg_start, seg_end):
+                found.add(table.groups[m.lastgroup])
+                if len(found) == len(table.names):
+                    return [{"name": name} for name in table.names]
+    return [{"name": name} for name in table.names if name in found]
+
+
+def new_mode_state(prompt, session_id=""):
+    now = datetime.now().isoformat()
+    return {
         "active": True,
-        "started_at": datetime.now().isoformat(),
+        "started_at": now,
         "original_prompt": prompt,
         "session_id": session_id or None,
         "reinforcement_count": 0,
-        "last_checked_at": datetime.now().isoformat(),
+        "last_checked_at": now,
     }
 
-    if session_id:
-        session_dir = Path(directory) / ".omd" / "state" / "sessions" / session_id
-        session_dir.mkdir(parents=True, exist_ok=True)
-        (session_dir / f"{state_name}-state.json").write_text(
-            json.dumps(state, indent=2)
-        )
-        return
 
-    local_dir = Path(directory) / ".omd" / "state"
-    local_dir.mkdir(parents=True, exist_ok=True)
-    (local_dir / f"{state_name}-state.json").write_text(json.dumps(state, indent=2))
+def activate_states(directory, prompt, state_names, session_id=""):
+    """Activate all modes for the prompt's scope in one atomic write."""
+    state = new_mode_state(prompt, session_id)
+    omd_modes.update_modes(
+        directory, {name: dict(state) for name in state_names}, session_id
+    )
 
 
-def clear_state_files(directory, mode_names, session_id=""):
-    for name in mode_names:
-        paths = [
-            Path(directory) / ".omd" / "state" / f"{name}-state.json",
-            Path.home() / ".omd" / "state" / f"{name}-state.json",
-        ]
-        if session_id:
-            paths.append(
-                Path(directory)
-                / ".omd"
-                / "state"
-                / "sessions"
-                / session_id
-                / f"{name}-state.json"
-            )
-        for p in paths:
-            try:
-                p.unlink(missing_ok=True)
-            except Exception:
-                pass
+def clear_states(directory, session_id=""):
+    """Deactivate every mode in the session and project scopes."""
+    if session_id:
+        omd_modes.clear_modes(directory, session_id)
+    omd_modes.clear_modes(directory)
 
 
 def create_skill_invocation(skill_name, original_prompt):
@@ -145,157 +204,63 @@ def create_hook_output(additional_context):
     }
 
 
-def resolve_conflicts(matches):
-    names = [m["name"] for m in matches]
-
-    if "cancel" in names:
-        return [m for m in matches if m["name"] == "cancel"]
-
-    resolved = list(matches)
-
-    if "ecomode" in names and "ultrawork" in names:
-        resolved = [m for m in resolved if m["name"] != "ultrawork"]
-
-    priority_order = [
-        "cancel",
-        "ralph",
-        "autopilot",
-        "ultrawork",
-        "ecomode",
-        "pipeline",
-        "plan",
-        "research",
-    ]
-    resolved.sort(
-        key=lambda m: (
-            priority_order.index(m["name"])
-            if m["name"] in priority_order
-            else len(priority_order)
-        )
-    )
+def resolve_conflicts(matches, table=None):
+    if table is None:
+        table = omd_keywords.load_table()
+    return table.resolve(matches)
 
-    return resolved
 
-
-def main():
+def handle(data):
     try:
-        input_str = read_stdin()
-        if not input_str.strip():
-            print(json.dumps({"continue": True, "suppressOutput": True}))
-            return
-
-        data = {}
-        try:
-            data = json.loads(input_str)
-        except Exception:
-            pass
-
         directory = data.get("cwd", data.get("directory", os.getcwd()))
         session_id = data.get("session_id", data.get("sessionId", ""))
 
-        prompt = extract_prompt(input_str)
+        prompt = extract_prompt(data)
         if not prompt:
-            print(json.dumps({"continue": True, "suppressOutput": True}))
-            return
-
-        clean = sanitize_for_detection(prompt).lower()
-
-        matches = []
-
-        # Cancel
-        if re.search(r"\b(cancelomd|stopomd)\b", clean):
-            matches.append({"name": "cancel"})
-
-        # Ralph
-        if re.search(r"\b(ralph|don't stop|must complete|until done)\b", clean):
-            matches.append({"name": "ralph"})
-
-        # Autopilot
-        if re.search(
-            r"\b(autopilot|auto pilot|auto-pilot|autonomous|full auto|fullsend)\b",
-            clean,
-        ) or re.search(
-            r"\bbuild\s+me\s+|\bcreate\s+me\s+|\bmake\s+me\s+|\bi\s+want\s+a\s+|\bhandle\s+it\s+all\b|\bend\s+to\s+end\b",
-            clean,
-        ):
-            matches.append({"name": "autopilot"})
-
-        # Ultrawork
-        if re.search(r"\b(ultrawork|ulw|uw)\b", clean):
-            matches.append({"name": "ultrawork"})
-
-        # Ecomode
-        if re.search(r"\b(eco|ecomode|eco-mode|efficient|save-tokens|budget)\b", clean):
-            matches.append({"name": "ecomode"})
-
-        # Pipeline
-        if re.search(r"\b(pipeline)\b", clean) or re.search(
-            r"\bchain\s+droids\b", clean
-        ):
-            matches.append({"name": "pipeline"})
-
-        # Plan
-        if re.search(r"\b(plan this|plan the)\b", clean):
-            matches.append({"name": "plan"})
-
-        # Research
-        if re.search(r"\b(research)\b", clean):
-            matches.append({"name": "research"})
+            return {"continue": True, "suppressOutput": True}
 
+        table = omd_keywords.load_table(directory)
+        matches = detect_keywords(prompt, table=table)
         if not matches:
-            print(json.dumps({"continue": True, "suppressOutput": True}))
-            return
-
-        # Deduplicate
-        seen = set()
-        unique = []
-        for m in matches:
-            if m["name"] not in seen:
-                seen.add(m["name"])
-                unique.append(m)
+            return {"continue": True, "suppressOutput": True}
 
-        resolved = resolve_conflicts(unique)
+        resolved = resolve_conflicts(matches, table)
 
         # Handle cancel
         if resolved and resolved[0]["name"] == "cancel":
-            clear_state_files(
-                directory,
-                ["ralph", "autopilot", "ultrawork", "ecomode", "pipeline"],
-                session_id,
-            )
-            print(
-                json.dumps(
-                    create_hook_output(create_skill_invocation("cancel", prompt))
-                )
-            )
-            return
+            clear_states(directory, session_id)
+            return create_hook_output(create_skill_invocation("cancel", prompt))
 
         # Activate states
         state_modes = [
-            m
+            m["name"]
             for m in resolved
             if m["name"] in ["ralph", "autopilot", "ultrawork", "ecomode"]
         ]
-        for mode in state_modes:
-            activate_state(directory, prompt, mode["name"], session_id)
 
         # Ralph auto-enables ultrawork
-        has_ralph = any(m["name"] == "ralph" for m in resolved)
-        has_ecomode = any(m["name"] == "ecomode" for m in resolved)
-        has_ultrawork = any(m["name"] == "ultrawork" for m in resolved)
-        if has_ralph and not has_ecomode and not has_ultrawork:
-            activate_state(directory, prompt, "ultrawork", session_id)
-
-        print(
-            json.dumps(
-                create_hook_output(
-                    create_multi_skill_invocation(resolved, prompt)
-                )
-            )
-        )
+        if "ralph" in state_modes and not (
+            {"ecomode", "ultrawork"} & set(state_modes)
+        ):
+            state_modes.append("ultrawork")
+
+        if state_modes:
+            activate_states(directory, prompt, state_modes, session_id)
+
+        return create_hook_output(create_multi_skill_invocation(resolved, prompt))
+
+    except Exception:
+        return {"continue": True, "suppressOutput": True}
+
 
+def main():
+    input_str = read_stdin()
+    data = {}
+    try:
+        data = json.loads(input_str)
     except Exception:
-        print(json.dumps({"continue": True, "suppressOutput": True}))
+        pass
+    print(json.dumps(handle(data)))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Hook Dispatcher (all events)
+
+Single entry point per hook event. Reads and parses the payload once,
+runs every handler registered for the event (omd_runtime.EVENTS) and
+prints one merged response, so PostToolUse and SessionStart cost one
+process instead of two. Forwards to hook-daemon.py when it is running,
+and runs the handlers in this process otherwise. With --hook it runs a
+single hook script instead (e.g. to try one hook on its own).
+
+Usage:
+    python3 omd-dispatch.py <event>
+    python3 omd-dispatch.py --hook <hook> [args...]
+
+Set OMD_HOOKD_AUTOSTART=1 to launch the daemon on the first fallback,
+and OMD_CAPTURE to record payloads and responses (see omd_trace.py).
+"""
+
+import os
+import sys
+import time
+
+from omd_client import call_daemon
+
+SUPPRESS_OUTPUT = '{"continue": true, "suppressOutput": true}'
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(SUPPRESS_OUTPUT)
+        return
+
+    if sys.argv[1] == "--hook":
+        if len(sys.argv) < 3:
+            print(SUPPRESS_OUTPUT)
+            return
+        kind, name, args = "hook", sys.argv[2], sys.argv[3:]
+    else:
+        kind, name, args = "event", sys.argv[1], []
+
+    try:
+        payload = sys.stdin.buffer.read()
+    except Exception:
+        payload = b""
+
+    started = time.time()
+    try:
+        reply = call_daemon([kind, os.getcwd(), name] + args, payload)
+    except Exception:
+        # The daemon took the request but failed mid-reply; running the
+        # handlers again here could repeat their side effects.
+        reply = SUPPRESS_OUTPUT.encode()
+    if reply is not None and not reply.strip():
+        reply = SUPPRESS_OUTPUT.encode()
+
+    in_process = reply is None
+    if in_process:
+        import omd_runtime
+
+        input_str = payload.decode("utf-8", "replace")
+        if kind == "hook":
+            output = omd_runtime.run_hook(name, args, input_str)
+        else:
+            output = omd_runtime.run_event(name, input_str)
+    else:
+        output = reply.decode("utf-8", "replace")
+    print(output)
+
+    if os.environ.get("OMD_CAPTURE"):
+        import omd_trace
+
+        omd_trace.capture(
+            kind, name, args, os.getcwd(), payload, output,
+            started, time.time() - started,
+        )
+
+    if in_process and os.environ.get("OMD_HOOKD_AUTOSTART") == "1":
+        omd_runtime.start_daemon()
+
+
+if __name__ == "__main__":
+    main()
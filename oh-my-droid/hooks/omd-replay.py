@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Hook Trace Replay for oh-my-droid
+
+Feeds a trace captured with OMD_CAPTURE (see omd_trace.py) back through
+the hooks against a scratch HOME and scratch project directories,
+checks that each response matches the recorded one, and reports
+throughput and latency. Project paths in payloads and responses are
+rewritten to the scratch copies; timestamps are ignored when comparing.
+
+Usage:
+    python3 omd-replay.py <trace.jsonl> [--timing sequential|recorded]
+                          [--speed N] [--subprocess] [--seed] [--limit N]
+                          [--scratch DIR] [--keep] [--json]
+
+--timing recorded   replay with the original gaps between events (/ --speed)
+--subprocess        run each record in a fresh interpreter (cold starts)
+--seed              copy each project's top-level files (not .omd/) first,
+                    so project detection sees the same markers
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from omd_ring import percentile
+
+HOOKS_DIR = Path(__file__).resolve().parent
+MAX_SEED_FILE_BYTES = 1024 * 1024
+SHOW_MISMATCHES = 5
+
+TIMESTAMP_PATTERNS = [
+    re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:[+-]\d{2}:\d{2}|Z)?"),
+    re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}(?::\d{2})?"),
+]
+
+
+def record_cwd(record: dict) -> str:
+    try:
+        data = json.loads(record.get("input") or "{}")
+        if isinstance(data, dict):
+            return data.get("cwd") or data.get("directory") or record.get("cwd", "")
+    except json.JSONDecodeError:
+        pass
+    return record.get("cwd", "")
+
+
+def json_escaped(path: str) -> str:
+    return json.dumps(path)[1:-1]
+
+
+class PathMap:
+    """Maps original project directories to scratch copies."""
+
+    def __init__(self, root: Path, seed: bool):
+        self.root = root
+        self.seed = seed
+        self.projects = {}
+
+    def project_for(self, original: str) -> Path:
+        if original not in self.projects:
+            scratch = self.root / "projects" / f"p{len(self.projects)}"
+            scratch.mkdir(parents=True, exist_ok=True)
+            if self.seed:
+                self._seed(Path(original), scratch)
+            self.projects[original] = scratch
+        return self.projects[original]
+
+    def _seed(self, source: Path, target: Path) -> None:
+        if not source.is_dir():
+            return
+        for entry in source.iterdir():
+            try:
+                if entry.is_file() and entry.stat().st_size <= MAX_SEED_FILE_BYTES:
+                    shutil.copy2(entry, target / entry.name)
+                elif entry.is_dir() and entry.name != ".omd":
+                    (target / entry.name).mkdir(exist_ok=True)
+            except OSError:
+                continue
+
+    def rewrite(self, text: str) -> str:
+        for original in sorted(self.projects, key=len, reverse=True):
+            if original:
+                text = text.replace(json_escaped(original),
+                                    json_escaped(str(self.projects[original])))
+        return text
+
+
+def normalize(text: str):
+    for pattern in TIMESTAMP_PATTERNS:
+        text = pattern.sub("<ts>", text)
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text.strip()
+
+
+def run_in_process(record: dict, input_str: str, cwd: Path) -> str:
+    import omd_runtime
+
+    os.chdir(cwd)
+    if record.get("kind") == "hook":
+        return omd_runtime.run_hook(record["name"], record.get("args", []), input_str)
+    return omd_runtime.run_event(record["name"], input_str)
+
+
+def run_subprocess(record: dict, input_str: str, cwd: Path) -> str:
+    if record.get("kind") == "hook":
+        argv = [sys.executable, str(HOOKS_DIR / "omd-dispatch.py"), "--hook", record["name"]]
+        argv += record.get("args", [])
+    else:
+        argv = [sys.executable, str(HOOKS_DIR / "omd-dispatch.py"), record["name"]]
+    result = subprocess.run(
+        argv, input=input_str, capture_output=True, text=True, cwd=str(cwd),
+        env=dict(os.environ),
+    )
+    return result.stdout
+
+
+def parse_options(args: list) -> dict:
+    opts = {"trace": None, "timing": "sequential", "speed": 1.0, "subprocess": False,
+            "seed": False, "limit": None, "scratch": None, "keep": False, "json": False}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg == "--timing" and value in ("sequential", "recorded"):
+            opts["timing"] = value
+            i += 1
+        elif arg == "--speed" and value:
+            opts["speed"] = max(float(value), 0.001)
+            i += 1
+        elif arg == "--limit" and value:
+            opts["limit"] = int(value)
+            i += 1
+        elif arg == "--scratch" and value:
+            opts["scratch"] = Path(value)
+            i += 1
+        elif arg in ("--subprocess", "--seed", "--keep", "--json"):
+            opts[arg[2:]] = True
+        elif not arg.startswith("--") and opts["trace"] is None:
+            opts["trace"] = Path(arg)
+        else:
+            raise SystemExit(f"Unknown option: {arg}")
+        i += 1
+    if opts["trace"] is None:
+        raise SystemExit("Usage: omd-replay.py <trace.jsonl> [options]")
+    return opts
+
+
+def replay(opts: dict) -> dict:
+    import omd_trace
+
+    records = omd_trace.load_trace(opts["trace"])
+    if opts["limit"]:
+        records = records[: opts["limit"]]
+
+    root = opts["scratch"] or Path(tempfile.mkdtemp(prefix="omd-replay-"))
+    root.mkdir(parents=True, exist_ok=True)
+    (root / "home").mkdir(exist_ok=True)
+
+    # Everything the hooks touch under ~ goes to the scratch HOME. Must
+    # happen before omd_runtime (and the hook modules) are imported.
+    os.environ["HOME"] = str(root / "home")
+    os.environ["OMD_HOOKD_SOCKET"] = str(root / "no-daemon.sock")
+    for key in ("OMD_CAPTURE", "OMD_HOOKD_AUTOSTART"):
+        os.environ.pop(key, None)
+
+    paths = PathMap(root, opts["seed"])
+    runner = run_subprocess if opts["subprocess"] else run_in_process
+    original_cwd = os.getcwd()
+
+    results = {"matched": 0, "mismatched": 0, "by_name": {}, "mismatches": []}
+    durations = []
+    replay_start = time.perf_counter()
+    first_ts = records[0].get("ts", 0) if records else 0
+
+    try:
+        for index, record in enumerate(records):
+            if opts["timing"] == "recorded":
+                due = (record.get("ts", first_ts) - first_ts) / opts["speed"]
+                delay = due - (time.perf_counter() - replay_start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            cwd = paths.project_for(record_cwd(record))
+            input_str = paths.rewrite(record.get("input", ""))
+            expected = paths.rewrite(record.get("output", ""))
+
+            start = time.perf_counter()
+            actual = runner(record, input_str, cwd)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            durations.append(elapsed_ms)
+
+            label = record.get("name", "?")
+            if record.get("kind") == "hook" and record.get("args"):
+                label = ":".join([label] + record["args"])
+            stats = results["by_name"].setdefault(
+                label, {"count": 0, "mismatched": 0, "replay_ms": [], "recorded_ms": []}
+            )
+            stats["count"] += 1
+            stats["replay_ms"].append(elapsed_ms)
+            stats["recorded_ms"].append(record.get("duration_ms", 0.0))
+
+            if normalize(actual) == normalize(expected):
+                results["matched"] += 1
+            else:
+                results["mismatched"] += 1
+                stats["mismatched"] += 1
+                if len(results["mismatches"]) < SHOW_MISMATCHES:
+                    results["mismatches"].append({
+                        "index": index,
+                        "name": label,
+                        "expected": expected[:300],
+                        "actual": actual.strip()[:300],
+                    })
+    finally:
+        os.chdir(original_cwd)
+        if not opts["keep"] and not opts["scratch"]:
+            shutil.rmtree(root, ignore_errors=True)
+
+    wall = time.perf_counter() - replay_start
+    for stats in results["by_name"].values():
+        replay_ms, recorded_ms = stats.pop("replay_ms"), stats.pop("recorded_ms")
+        stats["replay_p50_ms"] = round(percentile(replay_ms, 50), 3)
+        stats["replay_p99_ms"] = round(percentile(replay_ms, 99), 3)
+        stats["recorded_p50_ms"] = round(percentile(recorded_ms, 50), 3)
+        stats["recorded_p99_ms"] = round(percentile(recorded_ms, 99), 3)
+
+    results.update({
+        "trace": str(opts["trace"]),
+        "records": len(records),
+        "mode": "subprocess" if opts["subprocess"] else "in-process",
+        "timing": opts["timing"],
+        "wall_seconds": round(wall, 3),
+        "throughput_per_second": round(len(records) / wall, 1) if wall > 0 else 0.0,
+        "replay_p50_ms": round(percentile(durations, 50), 3),
+        "replay_p99_ms": round(percentile(durations, 99), 3),
+        "scratch": str(root) if opts["keep"] or opts["scratch"] else None,
+    })
+    return results
+
+
+def print_report(report: dict) -> None:
+    print(f"Replayed {report['records']} records from {report['trace']} "
+          f"({report['mode']}, {report['timing']} timing)")
+    print(f"  matched {report['matched']}, mismatched {report['mismatched']}")
+    print(f"  wall {report['wall_seconds']:.3f}s, "
+          f"{report['throughput_per_second']:.1f} records/s, "
+          f"p50 {report['replay_p50_ms']:.3f} ms, p99 {report['replay_p99_ms']:.3f} ms")
+
+    print(f"\n  {'name':34} {'count':>6} {'diff':>5} {'p50':>9} {'p99':>9} {'rec p50':>9} {'rec p99':>9}")
+    for name, s in sorted(report["by_name"].items()):
+        print(f"  {name:34} {s['count']:6d} {s['mismatched']:5d} {s['replay_p50_ms']:9.3f} "
+              f"{s['replay_p99_ms']:9.3f} {s['recorded_p50_ms']:9.3f} {s['recorded_p99_ms']:9.3f}")
+
+    for m in report["mismatches"]:
+        print(f"\n  mismatch #{m['index']} ({m['name']})")
+        print(f"    expected: {m['expected']}")
+        print(f"    actual:   {m['actual']}")
+
+    if report["scratch"]:
+        print(f"\n  scratch kept at {report['scratch']}")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    opts = parse_options(sys.argv[1:])
+    report = replay(opts)
+    if opts["json"]:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(1 if report["mismatched"] else 0)
+
+
+if __name__ == "__main__":
+    main()
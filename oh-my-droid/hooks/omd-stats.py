@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Hook Statistics for oh-my-droid
+
+Reports on the hook latency ring recorded by omd_runtime (see
+omd_latency.py): percentiles and histograms per hook and per event.
+
+Usage:
+    python3 omd-stats.py latency [--hook NAME] [--event NAME] [--session ID]
+                                 [--since MINUTES] [--json]
+"""
+
+import json
+import sys
+import time
+
+import omd_latency
+from omd_ring import percentile
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf")]
+BAR_WIDTH = 40
+
+
+def summarize(rows: list) -> dict:
+    durations = sorted(r["duration_ms"] for r in rows)
+    outcomes = {}
+    for r in rows:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+
+    histogram = [0] * len(BUCKETS_MS)
+    for d in durations:
+        for i, bound in enumerate(BUCKETS_MS):
+            if d <= bound:
+                histogram[i] += 1
+                break
+
+    return {
+        "count": len(durations),
+        "p50_ms": round(percentile(durations, 50), 3),
+        "p90_ms": round(percentile(durations, 90), 3),
+        "p99_ms": round(percentile(durations, 99), 3),
+        "max_ms": round(durations[-1], 3) if durations else 0.0,
+        "outcomes": outcomes,
+        "histogram": histogram,
+    }
+
+
+def group_by(rows: list, key: str) -> dict:
+    groups = {}
+    for r in rows:
+        groups.setdefault(r[key], []).append(r)
+    return {name: summarize(items) for name, items in sorted(groups.items())}
+
+
+def format_bucket(i: int) -> str:
+    bound = BUCKETS_MS[i]
+    return f"<= {bound:g} ms" if bound != float("inf") else f" > {BUCKETS_MS[i - 1]:g} ms"
+
+
+def print_group(title: str, groups: dict) -> None:
+    print(f"\n{title}")
+    print(f"  {'name':36} {'count':>7} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  outcomes")
+    for name, s in groups.items():
+        outcomes = " ".join(f"{k}={v}" for k, v in sorted(s["outcomes"].items()))
+        print(
+            f"  {name:36} {s['count']:7d} {s['p50_ms']:9.3f} {s['p90_ms']:9.3f} "
+            f"{s['p99_ms']:9.3f} {s['max_ms']:9.3f}  {outcomes}"
+        )
+
+    for name, s in groups.items():
+        peak = max(s["histogram"]) or 1
+        print(f"\n  {name}")
+        for i, n in enumerate(s["histogram"]):
+            if n:
+                bar = "#" * max(1, round(n / peak * BAR_WIDTH))
+                print(f"    {format_bucket(i):>12} {n:7d} {bar}")
+
+
+def parse_filters(args: list) -> dict:
+    opts = {"hook": None, "event": None, "session": None, "since": None, "json": False}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--json":
+            opts["json"] = True
+        elif arg in ("--hook", "--event", "--session", "--since") and i + 1 < len(args):
+            opts[arg[2:]] = args[i + 1]
+            i += 1
+        else:
+            raise SystemExit(f"Unknown option: {arg}")
+        i += 1
+    return opts
+
+
+def cmd_latency(args: list) -> None:
+    """Latency percentiles and histograms per hook and per event"""
+    opts = parse_filters(args)
+    rows = omd_latency.read_records()
+
+    if opts["since"]:
+        cutoff = time.time() - float(opts["since"]) * 60
+        rows = [r for r in rows if r["timestamp"] >= cutoff]
+    if opts["session"]:
+        rows = [r for r in rows if r["session_id"] == opts["session"]]
+    if opts["event"]:
+        rows = [r for r in rows if r["event"] == opts["event"]]
+    if opts["hook"]:
+        rows = [r for r in rows if r["hook"] in (opts["hook"], omd_latency.EVENT_TOTAL)]
+
+    hook_rows = [r for r in rows if r["hook"] != omd_latency.EVENT_TOTAL]
+    event_rows = [r for r in rows if r["hook"] == omd_latency.EVENT_TOTAL]
+    report = {
+        "file": str(omd_latency.LATENCY_FILE),
+        "records": len(rows),
+        "by_hook": group_by(hook_rows, "hook"),
+        "by_event": group_by(event_rows, "event"),
+        "buckets_ms": [b if b != float("inf") else None for b in BUCKETS_MS],
+    }
+
+    if opts["json"]:
+        print(json.dumps(report, indent=2))
+        return
+
+    if not rows:
+        print(f"No latency records in {report['file']}")
+        return
+
+    print(f"{report['records']} records from {report['file']}")
+    print_group("Per hook (handler time, ms)", report["by_hook"])
+    if report["by_event"]:
+        print_group("Per event (all handlers, ms)", report["by_event"])
+
+
+def main():
+    """CLI entry point"""
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(0)
+
+    command = sys.argv[1]
+    commands = {
+        "latency": cmd_latency,
+    }
+
+    if command in commands:
+        commands[command](sys.argv[2:])
+    else:
+        print(f"Unknown command: {command}")
+        print("Available commands: latency")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
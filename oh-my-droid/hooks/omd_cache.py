@@ -0,0 +1,189 @@
+"""
+Read Cache for oh-my-droid hooks
+
+Stat-validated cache for the .omd state files the hooks read on every
+event. Entries are keyed on (path, mtime_ns, size, inode), so any write
+or atomic replace of the file invalidates them.
+
+Two tiers:
+    memory   parsed JSON and derived values; inside hook-daemon.py this
+             keeps project memory, mode states and todo counts warm
+    sidecar  derived values only, marshal-encoded under
+             ~/.factory/.omd/cache/, so one-shot hook processes can skip
+             reading and parsing a large file that has not changed
+
+Cached objects are shared, also between hook-daemon.py's handler
+threads: a read-modify-write holds updating(path), mutates a copy from
+read_json_copy() and writes it back with store(). Temp files for atomic
+writes are named by tmp_path(), unique per process and thread.
+"""
+
+import copy
+import json
+import marshal
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+SIDECAR_DIR = Path.home() / ".factory" / ".omd" / "cache"
+
+# Files modified this recently are not trusted by their stat key alone: a
+# second write within the same timestamp tick could keep the same key.
+# They are re-read on every lookup and never written to a sidecar.
+RACY_WINDOW_NS = 50_000_000
+
+_MISSING = object()
+_entries: dict = {}
+_locks: dict = {}
+_locks_guard = threading.Lock()
+
+
+def tmp_path(target: Path) -> Path:
+    """Temp file next to target for an atomic replace, unique per process and thread."""
+    return target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+@contextmanager
+def updating(path):
+    """Serialize read-modify-write of path between this process's threads."""
+    with _locks_guard:
+        lock = _locks.setdefault(str(path), threading.Lock())
+    with lock:
+        yield
+
+
+def _stat_key(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _settled(key) -> bool:
+    """Whether the file was last modified outside the racy window"""
+    return time.time_ns() - key[0] >= RACY_WINDOW_NS
+
+
+def _cached(entry_key, key) -> Any:
+    """Cached value under entry_key if it is still valid for key"""
+    cached = _entries.get(entry_key)
+    if cached and cached[0] == key and cached[2]:
+        return cached[1]
+    return _MISSING
+
+
+def read_json(path) -> Optional[Any]:
+    """Return parsed JSON for path, or None if it is missing or invalid."""
+    path = str(path)
+    try:
+        key = _stat_key(path)
+    except OSError:
+        _entries.pop(path, None)
+        return None
+
+    cached = _cached(path, key)
+    if cached is not _MISSING:
+        return cached
+
+    try:
+        data = json.loads(Path(path).read_text())
+    except Exception:
+        _entries.pop(path, None)
+        return None
+
+    # Read within the racy window: usable now, but not trusted next time
+    _entries[path] = (key, data, _settled(key))
+    return data
+
+
+def read_json_copy(path) -> Optional[Any]:
+    """read_json() result that the caller may mutate."""
+    return copy.deepcopy(read_json(path))
+
+
+def _sidecar_path(path: str, tag: str) -> Path:
+    digest = zlib.crc32(f"{tag}\0{path}".encode("utf-8", "surrogateescape"))
+    return SIDECAR_DIR / f"{tag}-{digest:08x}.bin"
+
+
+def _read_sidecar(path: str, tag: str, key) -> Any:
+    try:
+        with open(_sidecar_path(path, tag), "rb") as f:
+            stored_path, stored_key, value = marshal.load(f)
+    except Exception:
+        return _MISSING
+    if stored_path != path or tuple(stored_key) != key:
+        return _MISSING
+    return value
+
+
+def _write_sidecar(path: str, tag: str, key, value: Any) -> None:
+    if not _settled(key):
+        return
+    target = _sidecar_path(path, tag)
+    tmp = tmp_path(target)
+    try:
+        SIDECAR_DIR.mkdir(parents=True, exist_ok=True)
+        tmp.write_bytes(marshal.dumps((path, key, value)))
+        os.replace(tmp, target)
+    except Exception:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def derive(path, tag: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+    """
+    Return fn(parsed JSON of path), cached until the file changes.
+
+    Use for small summaries of large files (e.g. todo counts). The value
+    must be marshal-able: None, bool, numbers, str, and lists/tuples/dicts
+    of those. Returns default when the file is missing or unreadable.
+    """
+    path = str(path)
+    try:
+        key = _stat_key(path)
+    except OSError:
+        _entries.pop((path, tag), None)
+        return default
+
+    cached = _cached((path, tag), key)
+    if cached is not _MISSING:
+        return cached
+
+    value = _read_sidecar(path, tag, key)
+    if value is _MISSING:
+        data = read_json(path)
+        if data is None:
+            return default
+        try:
+            value = fn(data)
+        except Exception:
+            return default
+        _write_sidecar(path, tag, key, value)
+
+    _entries[(path, tag)] = (key, value, _settled(key))
+    return value
+
+
+def store(path, data: Any) -> None:
+    """Record data as the current content of an already-written path."""
+    path = str(path)
+    try:
+        key = _stat_key(path)
+        _entries[path] = (key, data, _settled(key))
+    except OSError:
+        _entries.pop(path, None)
+
+
+def invalidate(path=None) -> None:
+    """Forget one path (and values derived from it), or everything."""
+    if path is None:
+        _entries.clear()
+        return
+    path = str(path)
+    for key in [k for k in _entries if k == path or (isinstance(k, tuple) and k[0] == path)]:
+        del _entries[key]
@@ -0,0 +1,70 @@
+"""
+Hook Daemon Client for oh-my-droid
+
+Minimal unix-socket client for hook-daemon.py. Every hook event pays
+for this module's imports, so it sticks to os/sys and the C-level
+_socket module (plain `socket` pulls in enum and selectors).
+
+Wire format:
+    <header length>\\n<header><payload>
+
+The header is NUL-separated UTF-8 fields: op, cwd, then op-specific
+fields (event name for "event", hook name and args for "hook"). The
+client half-closes the socket and the daemon replies with the hook's
+stdout text. A daemon that takes a request but does not answer within
+REPLY_TIMEOUT yields an empty reply, which callers treat as "nothing
+to say", well before Droid's own hook timeout would kill the hook.
+"""
+
+import os
+import _socket
+
+SOCKET_PATH = os.environ.get("OMD_HOOKD_SOCKET") or os.path.join(
+    os.path.expanduser("~"), ".factory", ".omd", "hookd.sock"
+)
+CONNECT_TIMEOUT = 0.2
+# Below the smallest hook timeout in hooks.json (3 s)
+REPLY_TIMEOUT = 2.5
+
+
+def encode_request(fields, payload: bytes = b"") -> bytes:
+    header = "\0".join(fields).encode("utf-8", "surrogateescape")
+    return b"%d\n" % len(header) + header + payload
+
+
+def decode_request(data: bytes):
+    """Split a raw request into (fields, payload). Used by the daemon."""
+    size, _, rest = data.partition(b"\n")
+    size = int(size or 0)
+    fields = rest[:size].decode("utf-8", "surrogateescape").split("\0")
+    return fields, rest[size:]
+
+
+def call_daemon(fields, payload: bytes = b""):
+    """Send one request to the daemon. Returns None if it is not running,
+    and an empty reply if it stops answering."""
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(SOCKET_PATH)
+        except OSError:
+            return None
+
+        sock.settimeout(REPLY_TIMEOUT)
+        sock.sendall(encode_request(fields, payload))
+        sock.shutdown(_socket.SHUT_WR)
+
+        chunks = []
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except _socket.timeout:
+                # Hung mid-request: don't run the handlers again here
+                return b""
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        sock.close()
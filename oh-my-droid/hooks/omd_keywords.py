@@ -0,0 +1,226 @@
+r"""
+Keyword Table for oh-my-droid
+
+Magic keyword families, their priority and conflict rules, used by
+keyword-detector.py. The built-in table can be extended or overridden
+per user (~/.factory/.omd/keywords.json) and per project
+(<project>/.omd/keywords.json, applied last):
+
+    {
+      "keywords": {
+        "deploy": "\\bship it\\b|\\bdeploy (?:this|it)\\b",
+        "research": null
+      },
+      "priority": ["cancel", "deploy"],
+      "beats": {"deploy": ["pipeline"]}
+    }
+
+keywords  name -> regex (or list of regexes); null removes a family.
+          A match invokes the oh-my-droid-<name> skill.
+priority  names moved to the front of the priority order, in this order.
+beats     name -> families it removes when both match ("*" = all others);
+          an empty list removes the rule.
+
+Compiled tables are cached in memory by a hash of the merged config, so
+the daemon compiles once per config change. Compiled patterns cannot be
+usefully pickled (unpickling recompiles them), so one-shot hook processes
+compile once per process.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Optional
+
+import omd_cache
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants
+    import sre_parse
+
+USER_CONFIG = Path.home() / ".factory" / ".omd" / "keywords.json"
+PROJECT_CONFIG = Path(".omd") / "keywords.json"
+
+# Built-in families in priority order
+DEFAULT_KEYWORDS = [
+    ("cancel", r"\b(?:cancelomd|stopomd)\b"),
+    ("ralph", r"\b(?:ralph|don't stop|must complete|until done)\b"),
+    (
+        "autopilot",
+        r"\b(?:autopilot|auto pilot|auto-pilot|autonomous|full auto|fullsend)\b"
+        r"|\bbuild\s+me\s+|\bcreate\s+me\s+|\bmake\s+me\s+|\bi\s+want\s+a\s+"
+        r"|\bhandle\s+it\s+all\b|\bend\s+to\s+end\b",
+    ),
+    ("ultrawork", r"\b(?:ultrawork|ulw|uw)\b"),
+    ("ecomode", r"\b(?:eco|ecomode|eco-mode|efficient|save-tokens|budget)\b"),
+    ("pipeline", r"\bpipeline\b|\bchain\s+droids\b"),
+    ("plan", r"\b(?:plan this|plan the)\b"),
+    ("research", r"\bresearch\b"),
+]
+
+# Cancel clears every other mode; ecomode wins over ultrawork
+DEFAULT_BEATS = {
+    "cancel": ["*"],
+    "ecomode": ["ultrawork"],
+}
+
+MAX_CACHED_TABLES = 16
+
+_tables: dict = {}
+
+
+def _leading_chars(items):
+    """
+    Characters a parsed pattern can start with, or None if unknown.
+
+    Word boundaries are skipped; anything other than literals, small
+    character sets, groups and alternations gives up.
+    """
+    chars = set()
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue
+        if op is sre_constants.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_constants.IN and all(o is sre_constants.LITERAL for o, _ in av):
+            chars.update(chr(v) for _, v in av)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                sub = _leading_chars(branch)
+                if sub is None:
+                    return None
+                chars |= sub
+        elif op is sre_constants.SUBPATTERN:
+            sub = _leading_chars(av[-1])
+            if sub is None:
+                return None
+            chars |= sub
+        else:
+            return None
+        return chars
+    return None
+
+
+def compile_keywords(patterns):
+    """
+    Compile (name, pattern) pairs into one case-insensitive alternation,
+    with group k<i> for the i-th family.
+
+    Python's re cannot skip ahead over text when a pattern starts with
+    \b, so when every family's first characters are known the matcher is
+    prefixed with a lookahead on them; on long prompts this lets it skip
+    most positions without trying each branch.
+    """
+    body = "|".join(f"(?P<k{i}>{pattern})" for i, (_, pattern) in enumerate(patterns))
+    try:
+        first = _leading_chars(sre_parse.parse(body, re.IGNORECASE))
+    except Exception:
+        first = None
+    if first:
+        body = f"(?=[{''.join(re.escape(c) for c in sorted(first))}])(?:{body})"
+    return re.compile(body, re.IGNORECASE)
+
+
+class KeywordTable:
+    """Compiled keyword families with their priority and conflict rules."""
+
+    def __init__(self, patterns: list, beats: dict):
+        self.names = [name for name, _ in patterns]
+        self.rank = {name: i for i, name in enumerate(self.names)}
+        self.beats = beats
+        self.regex = compile_keywords(patterns) if patterns else None
+        self.groups = {f"k{i}": name for i, name in enumerate(self.names)}
+
+    def resolve(self, matches: list) -> list:
+        """Apply conflict rules, then sort matches by priority."""
+        present = {m["name"] for m in matches}
+        removed = set()
+        for name in sorted(present, key=lambda n: self.rank.get(n, len(self.rank))):
+            if name in removed:
+                continue
+            for loser in self.beats.get(name, []):
+                if loser == "*":
+                    removed |= present - {name}
+                else:
+                    removed.add(loser)
+        resolved = [m for m in matches if m["name"] not in removed]
+        resolved.sort(key=lambda m: self.rank.get(m["name"], len(self.rank)))
+        return resolved
+
+
+def _as_pattern(value) -> Optional[str]:
+    """Validate one configured pattern (str or list of str)."""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value:
+        return None
+    try:
+        for part in value:
+            re.compile(part)
+    except (re.error, TypeError):
+        return None
+    return "|".join(f"(?:{part})" for part in value)
+
+
+def build_table(layers: list) -> KeywordTable:
+    """Merge config layers over the built-in table and compile it."""
+    patterns = dict(DEFAULT_KEYWORDS)
+    order = [name for name, _ in DEFAULT_KEYWORDS]
+    beats = {name: list(losers) for name, losers in DEFAULT_BEATS.items()}
+
+    for layer in layers:
+        keywords = layer.get("keywords")
+        if isinstance(keywords, dict):
+            for name, value in keywords.items():
+                if value is None:
+                    patterns.pop(name, None)
+                    continue
+                pattern = _as_pattern(value)
+                if pattern is None:
+                    continue
+                patterns[name] = pattern
+                if name not in order:
+                    order.append(name)
+
+        priority = layer.get("priority")
+        if isinstance(priority, list):
+            front = [n for n in priority if isinstance(n, str)]
+            order = list(dict.fromkeys(front)) + [n for n in order if n not in front]
+
+        layer_beats = layer.get("beats")
+        if isinstance(layer_beats, dict):
+            for name, losers in layer_beats.items():
+                if isinstance(losers, list) and losers:
+                    beats[name] = [x for x in losers if isinstance(x, str)]
+                else:
+                    beats.pop(name, None)
+
+    return KeywordTable([(n, patterns[n]) for n in order if n in patterns], beats)
+
+
+def load_table(directory=None) -> KeywordTable:
+    """
+    Keyword table for a project: built-ins plus user and project config.
+    Reuses the compiled table while the merged config is unchanged.
+    """
+    paths = [USER_CONFIG]
+    if directory:
+        paths.append(Path(directory) / PROJECT_CONFIG)
+    layers = [c for c in (omd_cache.read_json(p) for p in paths) if isinstance(c, dict)]
+
+    key = hashlib.sha1(json.dumps(layers, sort_keys=True).encode()).hexdigest()
+    table = _tables.get(key)
+    if table is None:
+        if len(_tables) >= MAX_CACHED_TABLES:
+            _tables.clear()
+        try:
+            table = build_table(layers)
+        except re.error:
+            # Patterns valid on their own can still clash when combined
+            # (duplicate group names, numbered backreferences)
+            table = build_table([])
+        _tables[key] = table
+    return table
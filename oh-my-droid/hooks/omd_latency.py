@@ -0,0 +1,86 @@
+"""
+Hook Latency Recorder for oh-my-droid
+
+Records one fixed-size record per hook invocation (event, hook, session
+id, duration, outcome) into a binary ring under ~/.factory/.omd/, so
+recording costs microseconds and the file stays bounded. omd_runtime
+records every handler plus one "*" record per dispatched event;
+omd-stats.py reads them back.
+
+Set OMD_LATENCY=0 to disable recording.
+"""
+
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+from omd_ring import RingFile, pack_text, unpack_text
+
+LATENCY_FILE = Path.home() / ".factory" / ".omd" / "hook-latency.ring"
+CAPACITY = 16384
+
+# timestamp, duration_us, outcome, event, hook, session_id
+RECORD = struct.Struct("<dIB3x20s32s44s")
+
+OUTCOMES = ("ok", "quiet", "blocked", "error")
+EVENT_TOTAL = "*"
+
+_ring = None
+_ring_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.environ.get("OMD_LATENCY", "1") != "0"
+
+
+def get_ring() -> RingFile:
+    global _ring
+    if _ring is None:
+        with _ring_lock:
+            if _ring is None:
+                _ring = RingFile(LATENCY_FILE, RECORD, CAPACITY)
+    return _ring
+
+
+def outcome_of(response, error: bool = False) -> str:
+    if error or not isinstance(response, dict):
+        return "error"
+    if response.get("continue") is False:
+        return "blocked"
+    if response.get("suppressOutput"):
+        return "quiet"
+    return "ok"
+
+
+def record(event: str, hook: str, session_id: str, duration: float, outcome: str) -> None:
+    """Append one invocation. Never raises."""
+    if not enabled():
+        return
+    try:
+        get_ring().append(
+            time.time(),
+            min(int(duration * 1_000_000), 0xFFFFFFFF),
+            OUTCOMES.index(outcome) if outcome in OUTCOMES else OUTCOMES.index("error"),
+            pack_text(event, 20),
+            pack_text(hook, 32),
+            pack_text(session_id, 44),
+        )
+    except Exception:
+        pass
+
+
+def read_records() -> list:
+    """All stored invocations as dicts, oldest first."""
+    rows = []
+    for ts, duration_us, outcome, event, hook, session in get_ring().records():
+        rows.append({
+            "timestamp": ts,
+            "duration_ms": duration_us / 1000,
+            "outcome": OUTCOMES[outcome] if outcome < len(OUTCOMES) else "error",
+            "event": unpack_text(event),
+            "hook": unpack_text(hook),
+            "session_id": unpack_text(session),
+        })
+    return rows
@@ -0,0 +1,96 @@
+"""
+Mode State for oh-my-droid
+
+Active persistent modes (ralph, autopilot, ultrawork, ...) for one scope
+are kept together in a single modes.json:
+
+    .omd/state/modes.json                        project scope
+    .omd/state/sessions/<session_id>/modes.json  session scope
+
+    {"modes": {"ralph": {"active": true, "started_at": ..., ...}}}
+
+Every change rewrites the whole file through a temp file and rename, so
+activating several modes is one write, clearing them is one write, and
+readers never see a half-activated set. Scopes without a modes.json fall
+back to the per-mode <mode>-state.json files written by older versions;
+once a modes.json exists those files are ignored.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import omd_cache
+
+MODES_FILE = "modes.json"
+
+
+def scope_dir(directory, session_id="") -> Path:
+    state_dir = Path(directory) / ".omd" / "state"
+    if session_id:
+        return state_dir / "sessions" / session_id
+    return state_dir
+
+
+def modes_path(directory, session_id="") -> Path:
+    return scope_dir(directory, session_id) / MODES_FILE
+
+
+def _read_legacy(directory, session_id="") -> dict:
+    modes = {}
+    base = scope_dir(directory, session_id)
+    try:
+        entries = list(base.glob("*-state.json"))
+    except OSError:
+        return modes
+    for path in entries:
+        state = omd_cache.read_json(path)
+        if isinstance(state, dict):
+            modes[path.name[: -len("-state.json")]] = state
+    return modes
+
+
+def read_modes(directory, session_id="") -> dict:
+    """Mode name -> state for one scope. The result is shared; copy to mutate."""
+    data = omd_cache.read_json(modes_path(directory, session_id))
+    if isinstance(data, dict):
+        modes = data.get("modes")
+        return modes if isinstance(modes, dict) else {}
+    return _read_legacy(directory, session_id)
+
+
+def write_modes(directory, modes: dict, session_id="") -> bool:
+    """Atomically replace the scope's modes.json with modes."""
+    path = modes_path(directory, session_id)
+    tmp = omd_cache.tmp_path(path)
+    data = {"modes": modes}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps(data, indent=2))
+        os.replace(tmp, path)
+        omd_cache.store(path, data)
+        return True
+    except Exception:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        omd_cache.invalidate(path)
+        return False
+
+
+def update_modes(directory, changes: dict, session_id="") -> bool:
+    """Merge name -> state changes into a scope in one write (None removes)."""
+    with omd_cache.updating(modes_path(directory, session_id)):
+        modes = dict(read_modes(directory, session_id))
+        for name, state in changes.items():
+            if state is None:
+                modes.pop(name, None)
+            else:
+                modes[name] = state
+        return write_modes(directory, modes, session_id)
+
+
+def clear_modes(directory, session_id="") -> bool:
+    """Deactivate every mode in a scope with one write."""
+    return write_modes(directory, {}, session_id)
@@ -0,0 +1,137 @@
+"""
+Ring File for oh-my-droid
+
+Fixed-size binary ring of fixed-size records. Appending is one locked
+pwrite of the record plus an 8-byte counter update, never a rewrite of
+the file, so it costs microseconds and the file never grows past
+HEADER_SIZE + capacity * record size. flock() covers other processes;
+threads share the descriptor (and so its flock), so a RingFile also
+holds a thread lock around each append and read.
+
+Layout:
+    header  magic(8) record_size(u32) capacity(u32) written(u64) padding
+    records capacity slots; record n lives in slot n % capacity
+"""
+
+import math
+import os
+import struct
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+MAGIC = b"OMDRING1"
+HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+COUNTER = struct.Struct("<Q")
+COUNTER_OFFSET = 16
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile: the smallest sample with pct% of them at or below it."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def pack_text(value, size: int) -> bytes:
+    """Encode a string into a fixed-width, NUL-padded field."""
+    return (value or "").encode("utf-8", "replace")[:size]
+
+
+def unpack_text(raw: bytes) -> str:
+    return raw.rstrip(b"\0").decode("utf-8", "replace")
+
+
+class RingFile:
+    """Fixed-capacity ring of struct records in a single file."""
+
+    def __init__(self, path, record: struct.Struct, capacity: int):
+        self.path = Path(path)
+        self.record = record
+        self.capacity = capacity
+        self._fd = None
+        self._thread_lock = threading.Lock()
+
+    def _open(self) -> int:
+        """The ring's descriptor, opened on first use (thread lock held)"""
+        if self._fd is not None:
+            return self._fd
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock(fd)
+        try:
+            header = os.pread(fd, HEADER.size, 0)
+            if len(header) < HEADER.size or HEADER.unpack(header)[:3] != (
+                MAGIC, self.record.size, self.capacity
+            ):
+                # New file or a different layout: start over
+                os.ftruncate(fd, 0)
+                os.pwrite(
+                    fd,
+                    HEADER.pack(MAGIC, self.record.size, self.capacity, 0).ljust(
+                        HEADER_SIZE, b"\0"
+                    ),
+                    0,
+                )
+        finally:
+            self._unlock(fd)
+        self._fd = fd
+        return fd
+
+    @staticmethod
+    def _lock(fd: int, shared: bool = False) -> None:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+
+    @staticmethod
+    def _unlock(fd: int) -> None:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def append(self, *values) -> None:
+        """Write one record into the next slot."""
+        data = self.record.pack(*values)
+        with self._thread_lock:
+            fd = self._open()
+            self._lock(fd)
+            try:
+                (written,) = COUNTER.unpack(os.pread(fd, COUNTER.size, COUNTER_OFFSET))
+                slot = written % self.capacity
+                os.pwrite(fd, data, HEADER_SIZE + slot * self.record.size)
+                os.pwrite(fd, COUNTER.pack(written + 1), COUNTER_OFFSET)
+            finally:
+                self._unlock(fd)
+
+    def records(self) -> list:
+        """All stored records as tuples, oldest first."""
+        if not self.path.exists():
+            return []
+        with self._thread_lock:
+            fd = self._open()
+            self._lock(fd, shared=True)
+            try:
+                (written,) = COUNTER.unpack(os.pread(fd, COUNTER.size, COUNTER_OFFSET))
+                count = min(written, self.capacity)
+                raw = os.pread(fd, count * self.record.size, HEADER_SIZE)
+            finally:
+                self._unlock(fd)
+
+        items = list(self.record.iter_unpack(raw[: len(raw) - len(raw) % self.record.size]))
+        if written > self.capacity:
+            start = written % self.capacity
+            items = items[start:] + items[:start]
+        return items
+
+    def close(self) -> None:
+        with self._thread_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
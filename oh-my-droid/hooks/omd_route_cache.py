@@ -0,0 +1,153 @@
+"""
+Routing Decision Cache for oh-my-droid
+
+Disk-backed LRU + TTL cache for intelligent-router.py, so prompts routed
+before skip the droid exec round-trip. One small JSON file per entry
+under ~/.factory/.omd/router/cache/, keyed by a hash of the normalized
+prompt and the DROIDS table version:
+
+    mtime       last use (touched on every hit; oldest evicted first)
+    created_at  stored in the entry; entries older than the TTL miss
+
+Hit/miss counters live in router/cache-counters.json.
+
+    OMD_ROUTER_CACHE_TTL      seconds an entry stays valid (default 7 days)
+    OMD_ROUTER_CACHE_ENTRIES  maximum entries kept (default 2048)
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import omd_cache
+
+ROUTER_DIR = Path.home() / ".factory" / ".omd" / "router"
+CACHE_DIR = ROUTER_DIR / "cache"
+COUNTERS_FILE = ROUTER_DIR / "cache-counters.json"
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 2048
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt."""
+    return " ".join(prompt.lower().split())
+
+
+def cache_key(prompt: str, version: str) -> str:
+    digest = hashlib.sha256(f"{version}\0{normalize_prompt(prompt)}".encode())
+    return digest.hexdigest()[:32]
+
+
+def _entry_path(key: str) -> Path:
+    return CACHE_DIR / f"{key}.json"
+
+
+def bump(name: str, amount: int = 1) -> None:
+    """Increment a named counter. Never raises."""
+    try:
+        ROUTER_DIR.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(COUNTERS_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                counters = json.loads(f.read() or "{}")
+            except json.JSONDecodeError:
+                counters = {}
+            counters[name] = counters.get(name, 0) + amount
+            f.seek(0)
+            f.truncate()
+            f.write(json.dumps(counters))
+    except Exception:
+        pass
+
+
+def counters() -> dict:
+    try:
+        return json.loads(COUNTERS_FILE.read_text())
+    except Exception:
+        return {}
+
+
+def get(key: str) -> Optional[dict]:
+    """Cached routing for key, or None (counted as a miss)."""
+    path = _entry_path(key)
+    try:
+        entry = json.loads(path.read_text())
+        fresh = time.time() - entry["created_at"] <= _env_int(
+            "OMD_ROUTER_CACHE_TTL", DEFAULT_TTL_SECONDS
+        )
+        routing = entry["routing"] if fresh else None
+    except (OSError, ValueError, KeyError, TypeError):
+        routing = None
+
+    if routing is None:
+        bump("misses")
+        return None
+
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    bump("hits")
+    return routing
+
+
+def put(key: str, routing: dict) -> None:
+    """Store a routing decision, evicting least recently used entries."""
+    path = _entry_path(key)
+    tmp = omd_cache.tmp_path(path)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp.write_text(json.dumps({"created_at": time.time(), "routing": routing}))
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return
+    evict(_env_int("OMD_ROUTER_CACHE_ENTRIES", DEFAULT_MAX_ENTRIES))
+
+
+def evict(max_entries: int) -> int:
+    """Remove least recently used entries beyond max_entries."""
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".json")]
+    except OSError:
+        return 0
+    excess = len(entries) - max_entries
+    if excess <= 0:
+        return 0
+
+    def mtime(entry):
+        try:
+            return entry.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    removed = 0
+    for entry in sorted(entries, key=mtime)[:excess]:
+        try:
+            os.unlink(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    bump("evictions", removed)
+    return removed
+
+
+def clear() -> int:
+    """Remove every cached entry."""
+    return evict(0)
@@ -0,0 +1,151 @@
+"""
+Local Routing Model for oh-my-droid
+
+Multinomial naive Bayes over word unigrams and bigrams, trained
+incrementally on intelligent-router.py's own AI routing decisions, so
+familiar kinds of prompt can be routed without a droid exec call.
+
+Stored at ~/.factory/.omd/router/model.json:
+
+    {"droids_version": "...",                    reset when DROIDS changes
+     "docs": {droid: n},                         training prompts per droid
+     "tokens": {droid: n},                       token count per droid
+     "words": {droid: {token: n}},
+     "vocabulary": n,                            distinct tokens overall
+     "autonomy": {droid: {"low": n, ...}}}
+
+Confidence is the top posterior with each class's log-likelihood divided
+by the square root of the prompt's token count; plain naive Bayes is
+near-certain about almost any prompt of more than a few words.
+Predictions below the threshold, or made before the model has seen
+enough examples, are not used.
+
+    OMD_ROUTER_MODEL_THRESHOLD  minimum confidence (default 0.8)
+    OMD_ROUTER_MODEL_MIN_DOCS   training prompts needed first (default 30)
+"""
+
+import fcntl
+import json
+import math
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+import omd_cache
+
+MODEL_FILE = Path.home() / ".factory" / ".omd" / "router" / "model.json"
+LOCK_FILE = MODEL_FILE.with_name("model.lock")
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MIN_DOCS = 30
+# Droids need this many examples before they can be predicted
+MIN_DOCS_PER_DROID = 3
+SMOOTHING = 1.0
+
+TOKEN_RE = re.compile(r"[a-z0-9_]{2,}")
+
+
+def tokenize(prompt: str) -> list:
+    words = TOKEN_RE.findall(prompt.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def empty_model(version: str) -> dict:
+    return {"droids_version": version, "docs": {}, "tokens": {}, "words": {},
+            "vocabulary": 0, "autonomy": {}}
+
+
+def load(version: str) -> dict:
+    model = omd_cache.read_json(MODEL_FILE)
+    if not isinstance(model, dict) or model.get("droids_version") != version:
+        return empty_model(version)
+    return model
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def predict(prompt: str, version: str, model: Optional[dict] = None) -> Optional[dict]:
+    """Most likely droid for prompt as a routing dict, or None."""
+    model = model or load(version)
+    total_docs = sum(model["docs"].values())
+    if total_docs < _env_float("OMD_ROUTER_MODEL_MIN_DOCS", DEFAULT_MIN_DOCS):
+        return None
+    tokens = tokenize(prompt)
+    if not tokens:
+        return None
+
+    vocab = model.get("vocabulary") or 1
+    scores = {}
+    for droid, docs in model["docs"].items():
+        if docs < MIN_DOCS_PER_DROID:
+            continue
+        words = model["words"].get(droid, {})
+        denom = model["tokens"].get(droid, 0) + SMOOTHING * vocab
+        loglik = sum(math.log((words.get(t, 0) + SMOOTHING) / denom) for t in tokens)
+        scores[droid] = math.log(docs / total_docs) + loglik / math.sqrt(len(tokens))
+    if len(scores) < 2:
+        # One known droid would always score 1.0
+        return None
+
+    top = max(scores.values())
+    weights = {d: math.exp(s - top) for d, s in scores.items()}
+    droid = max(weights, key=weights.get)
+    confidence = weights[droid] / sum(weights.values())
+    if confidence < _env_float("OMD_ROUTER_MODEL_THRESHOLD", DEFAULT_THRESHOLD):
+        return None
+
+    autonomy_counts = model["autonomy"].get(droid) or {"medium": 1}
+    return {
+        "droid": droid,
+        "autonomy": max(autonomy_counts, key=autonomy_counts.get),
+        "confidence": round(confidence, 3),
+        "reason": f"Local model ({model['docs'][droid]} of {total_docs} examples)",
+    }
+
+
+def learn(prompt: str, routing: dict, version: str) -> None:
+    """Add one AI routing decision to the model. Never raises."""
+    droid = routing.get("droid")
+    tokens = tokenize(prompt)
+    if not droid or not tokens:
+        return
+    try:
+        MODEL_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            omd_cache.invalidate(MODEL_FILE)
+            model = json.loads(json.dumps(load(version)))
+
+            model["docs"][droid] = model["docs"].get(droid, 0) + 1
+            model["tokens"][droid] = model["tokens"].get(droid, 0) + len(tokens)
+            words = model["words"].setdefault(droid, {})
+            for t in tokens:
+                if t not in words and not any(t in w for w in model["words"].values()):
+                    model["vocabulary"] = model.get("vocabulary", 0) + 1
+                words[t] = words.get(t, 0) + 1
+            autonomy = model["autonomy"].setdefault(droid, {})
+            level = routing.get("autonomy", "medium")
+            autonomy[level] = autonomy.get(level, 0) + 1
+
+            tmp = omd_cache.tmp_path(MODEL_FILE)
+            tmp.write_text(json.dumps(model, separators=(",", ":")))
+            os.replace(tmp, MODEL_FILE)
+            omd_cache.store(MODEL_FILE, model)
+    except Exception:
+        pass
+
+
+def summary(version: str) -> dict:
+    model = load(version)
+    return {
+        "file": str(MODEL_FILE),
+        "examples": sum(model["docs"].values()),
+        "per_droid": dict(sorted(model["docs"].items())),
+        "vocabulary": model.get("vocabulary", 0),
+    }
@@ -0,0 +1,167 @@
+"""
+Tier Outcomes for oh-my-droid
+
+How well each execution tier (executor-low, executor-med, executor-high,
+hephaestus) has done on each category of task, recorded by
+state-manager.py when a task finishes and used by intelligent-router.py
+--objective to pick a tier. Stored at ~/.factory/.omd/router/outcomes.json:
+
+    {"categories": {category: {droid: {"success": n, "failure": n,
+                                       "retries": n, "seconds": total}}}}
+
+A task that finishes "completed" is a success and one that finishes
+"error" a failure; retries counts how often a task was restarted after
+an error before finishing. Success rates are smoothed ((s + 1) / (n + 2))
+and a tier needs MIN_OUTCOMES finished tasks in a category to be chosen.
+
+Objectives:
+    cost     cheapest tier whose success rate reaches the target
+    latency  fastest tier (mean seconds) whose success rate reaches the target
+    quality  tier with the highest success rate
+
+    OMD_ROUTER_OBJECTIVE     default objective (unset: route on prompt text only)
+    OMD_ROUTER_MIN_SUCCESS   success rate target (default 0.8)
+"""
+
+import fcntl
+import json
+import os
+import re
+from typing import Optional
+
+import omd_cache
+from omd_route_cache import ROUTER_DIR
+
+OUTCOMES_FILE = ROUTER_DIR / "outcomes.json"
+LOCK_FILE = ROUTER_DIR / "outcomes.lock"
+
+# Cheapest first
+TIERS = ["executor-low", "executor-med", "executor-high", "hephaestus"]
+OBJECTIVES = ("cost", "latency", "quality")
+
+DEFAULT_MIN_SUCCESS = 0.8
+MIN_OUTCOMES = 5
+
+# First matching category wins
+CATEGORIES = [
+    ("rename", re.compile(r"\b(?:rename|typo|spelling)", re.IGNORECASE)),
+    ("docs", re.compile(r"\b(?:docs?|documentation|readme|comments?|docstrings?)\b", re.IGNORECASE)),
+    ("test", re.compile(r"\b(?:tests?|testing|coverage|spec)\b", re.IGNORECASE)),
+    ("bugfix", re.compile(r"\b(?:fix|bug|debug|crash|error|broken|fail)", re.IGNORECASE)),
+    ("refactor", re.compile(r"\b(?:refactor|clean\s*up|simplify|extract|restructure)", re.IGNORECASE)),
+    ("architecture", re.compile(r"\b(?:architect|design|migrat|microservice|from scratch)", re.IGNORECASE)),
+    ("feature", re.compile(r"\b(?:add|implement|create|build|support|new)\b", re.IGNORECASE)),
+]
+
+
+def categorize(prompt: str) -> str:
+    for name, regex in CATEGORIES:
+        if regex.search(prompt or ""):
+            return name
+    return "general"
+
+
+def load() -> dict:
+    data = omd_cache.read_json(OUTCOMES_FILE)
+    if not isinstance(data, dict) or not isinstance(data.get("categories"), dict):
+        return {"categories": {}}
+    return data
+
+
+def record(prompt: str, droid: str, success: bool, retries: int = 0,
+           seconds: Optional[float] = None) -> None:
+    """Count one finished task for droid in the prompt's category. Never raises."""
+    if droid not in TIERS:
+        return
+    try:
+        ROUTER_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            omd_cache.invalidate(OUTCOMES_FILE)
+            data = json.loads(json.dumps(load()))
+
+            stats = data["categories"].setdefault(categorize(prompt), {}).setdefault(
+                droid, {"success": 0, "failure": 0, "retries": 0, "seconds": 0.0}
+            )
+            stats["success" if success else "failure"] += 1
+            stats["retries"] += max(int(retries or 0), 0)
+            if seconds is not None and seconds >= 0:
+                stats["seconds"] = round(stats["seconds"] + seconds, 3)
+
+            tmp = omd_cache.tmp_path(OUTCOMES_FILE)
+            tmp.write_text(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp, OUTCOMES_FILE)
+            omd_cache.store(OUTCOMES_FILE, data)
+    except Exception:
+        pass
+
+
+def success_rate(stats: dict) -> float:
+    finished = stats["success"] + stats["failure"]
+    return (stats["success"] + 1) / (finished + 2)
+
+
+def _min_success() -> float:
+    try:
+        return float(os.environ.get("OMD_ROUTER_MIN_SUCCESS", DEFAULT_MIN_SUCCESS))
+    except ValueError:
+        return DEFAULT_MIN_SUCCESS
+
+
+def choose_tier(prompt: str, objective: str, current: str,
+                data: Optional[dict] = None) -> Optional[dict]:
+    """
+    Tier for prompt under objective, as {"droid", "category", "success_rate",
+    "tasks"}, or None to keep the current tier. A tier without enough
+    history counts as meeting the target: the router never escalates past
+    it (or, for quality, replaces it with a tier below the target) on no
+    evidence.
+    """
+    if objective not in OBJECTIVES or current not in TIERS:
+        return None
+    category = categorize(prompt)
+    tiers = (data or load())["categories"].get(category, {})
+    known = {}
+    for droid in TIERS:
+        stats = tiers.get(droid)
+        if stats and stats["success"] + stats["failure"] >= MIN_OUTCOMES:
+            known[droid] = stats
+
+    target = _min_success()
+    current_rate = success_rate(known[current]) if current in known else target
+    if objective == "quality":
+        candidates = [d for d in known if success_rate(known[d]) > current_rate]
+        # max() keeps the first (cheapest) of equally good tiers
+        pick = max(candidates, key=lambda d: success_rate(known[d]), default=None)
+    else:
+        # Escalate only past a tier known to miss the target; for latency the
+        # current tier competes too
+        ceiling = (len(TIERS) if current_rate < target
+                   else TIERS.index(current) + (objective == "latency"))
+        candidates = [d for d in known
+                      if TIERS.index(d) < ceiling and success_rate(known[d]) >= target]
+        if objective == "cost":
+            pick = candidates[0] if candidates else None
+        else:
+            pick = min(candidates, default=None, key=lambda d: known[d]["seconds"]
+                       / (known[d]["success"] + known[d]["failure"]))
+    if pick is None or pick == current:
+        return None
+
+    return {
+        "droid": pick,
+        "category": category,
+        "success_rate": round(success_rate(known[pick]), 3),
+        "tasks": known[pick]["success"] + known[pick]["failure"],
+    }
+
+
+def summary() -> dict:
+    result = {"file": str(OUTCOMES_FILE), "categories": {}}
+    for category, tiers in sorted(load()["categories"].items()):
+        result["categories"][category] = {
+            droid: dict(stats, success_rate=round(success_rate(stats), 3))
+            for droid, stats in sorted(tiers.items(), key=lambda item: TIERS.index(item[0])
+                                       if item[0] in TIERS else len(TIERS))
+        }
+    return result
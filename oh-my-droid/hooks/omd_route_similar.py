@@ -0,0 +1,251 @@
+"""
+Near-Duplicate Routing for oh-my-droid
+
+Lets intelligent-router.py reuse the decision for a past prompt that is
+nearly the same as a new one ("fix the bug in auth.py" / "fix the bug in
+user.py"), which the exact-prompt cache misses. Each routed prompt is
+reduced to a MinHash signature of its word unigrams and bigrams (file
+paths and numbers folded to placeholders): 64 16-bit minimums, taken
+from one SHAKE-128 digest per shingle. Signatures are indexed by LSH, 16
+bands of 4 values, so a lookup only compares the few prompts sharing a
+band with the new one.
+
+Everything lives in one fixed-size, memory-mapped file,
+~/.factory/.omd/router/similar.idx (sparse until used):
+
+    header   magic, layout, droid table version, entries written
+    buckets  BANDS x BUCKETS x SLOTS entry numbers; a full bucket
+             replaces its oldest entry
+    entries  CAPACITY records (signature, droid, autonomy, confidence);
+             entry n lives in slot n % CAPACITY, like omd_ring
+
+A match reuses the decision with its confidence scaled by the estimated
+Jaccard similarity.
+
+    OMD_ROUTER_SIMILAR            set to 0 to disable
+    OMD_ROUTER_SIMILAR_THRESHOLD  minimum estimated similarity (default 0.7)
+"""
+
+import hashlib
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Optional
+
+from omd_route_cache import ROUTER_DIR, normalize_prompt
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+INDEX_FILE = ROUTER_DIR / "similar.idx"
+
+HASHES = 64
+BANDS = 16
+ROWS = HASHES // BANDS
+BUCKETS = 16384
+SLOTS = 4
+CAPACITY = 65536
+DEFAULT_THRESHOLD = 0.7
+
+AUTONOMY = ("low", "medium", "high")
+
+MAGIC = b"OMDLSH01"
+# magic, hashes, bands, buckets, slots, capacity, droids version, written
+HEADER = struct.Struct("<8sIIIII16sQ")
+HEADER_SIZE = 64
+WRITTEN_OFFSET = HEADER.size - 8
+SIGNATURE = struct.Struct(f"<{HASHES}H")
+SLOT_ROW = struct.Struct(f"<{SLOTS}I")
+# signature, droid index, autonomy index, confidence percent
+RECORD = struct.Struct(f"<{HASHES * 2}sBBBx")
+
+INDEX_OFFSET = HEADER_SIZE
+INDEX_SIZE = BANDS * BUCKETS * SLOT_ROW.size
+ENTRIES_OFFSET = INDEX_OFFSET + INDEX_SIZE
+FILE_SIZE = ENTRIES_OFFSET + CAPACITY * RECORD.size
+
+TOKEN_RE = re.compile(r"\S+")
+PATH_RE = re.compile(r"[\w.-]*[/\\][\w./\\-]*|[\w-]+\.[a-z][a-z0-9]{0,4}$")
+NUMBER_RE = re.compile(r"\d+")
+STRIP_CHARS = "\"'`()[]{}<>,;:!?"
+
+
+def enabled() -> bool:
+    return os.environ.get("OMD_ROUTER_SIMILAR", "1") != "0"
+
+
+def _threshold() -> float:
+    try:
+        return float(os.environ.get("OMD_ROUTER_SIMILAR_THRESHOLD", DEFAULT_THRESHOLD))
+    except ValueError:
+        return DEFAULT_THRESHOLD
+
+
+def shingles(prompt: str) -> set:
+    """Word unigrams and bigrams, with paths and numbers as placeholders."""
+    words = []
+    for token in TOKEN_RE.findall(normalize_prompt(prompt)):
+        token = token.strip(STRIP_CHARS)
+        if not token:
+            continue
+        if PATH_RE.search(token):
+            token = "<path>"
+        words.append(NUMBER_RE.sub("#", token))
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def signature(prompt: str) -> Optional[bytes]:
+    """MinHash signature of the prompt, or None if it has no words."""
+    parts = shingles(prompt)
+    if not parts:
+        return None
+    rows = [
+        SIGNATURE.unpack(hashlib.shake_128(p.encode()).digest(HASHES * 2))
+        for p in parts
+    ]
+    return SIGNATURE.pack(*(min(column) for column in zip(*rows)))
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(SIGNATURE.unpack(a), SIGNATURE.unpack(b))) / HASHES
+
+
+def _bucket_offsets(sig: bytes) -> list:
+    band_size = ROWS * 2
+    offsets = []
+    for band in range(BANDS):
+        bucket = zlib.crc32(sig[band * band_size:(band + 1) * band_size]) % BUCKETS
+        offsets.append(INDEX_OFFSET + (band * BUCKETS + bucket) * SLOT_ROW.size)
+    return offsets
+
+
+def _version_field(version: str) -> bytes:
+    return version.encode()[:16].ljust(16, b"\0")
+
+
+class SimilarIndex:
+    """The memory-mapped LSH index for one droid table version."""
+
+    def __init__(self, version: str, path=INDEX_FILE):
+        self.version = _version_field(version)
+        self.path = path
+
+    def _open(self, create: bool):
+        """(fd, mmap) for the file, reset if its layout or version differs"""
+        if not create and not self.path.exists():
+            return None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o600)
+        view = None
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            header = os.pread(fd, HEADER.size, 0)
+            expected = (MAGIC, HASHES, BANDS, BUCKETS, SLOTS, CAPACITY, self.version)
+            if len(header) < HEADER.size or HEADER.unpack(header)[:7] != expected:
+                if not create:
+                    return None
+                # New file, another layout or another droid table: start over
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, FILE_SIZE)
+                os.pwrite(fd, HEADER.pack(*expected, 0), 0)
+            view = mmap.mmap(fd, FILE_SIZE)
+            return fd, view
+        finally:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            if view is None:
+                os.close(fd)
+
+    def add(self, prompt: str, routing: dict, droids: list) -> bool:
+        """Index a routed prompt. droids maps droid names to stored indexes."""
+        sig = signature(prompt)
+        if sig is None or routing.get("droid") not in droids:
+            return False
+        record = RECORD.pack(
+            sig,
+            droids.index(routing["droid"]),
+            AUTONOMY.index(routing.get("autonomy")) if routing.get("autonomy") in AUTONOMY else 1,
+            max(0, min(int(round(float(routing.get("confidence", 0.5)) * 100)), 100)),
+        )
+        fd, view = self._open(create=True)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            (written,) = struct.unpack_from("<Q", view, WRITTEN_OFFSET)
+            start = ENTRIES_OFFSET + (written % CAPACITY) * RECORD.size
+            view[start:start + RECORD.size] = record
+            for offset in _bucket_offsets(sig):
+                slots = list(SLOT_ROW.unpack_from(view, offset))
+                # Entry numbers are stored + 1 so that 0 means empty
+                slots[slots.index(min(slots))] = written + 1
+                SLOT_ROW.pack_into(view, offset, *slots)
+            struct.pack_into("<Q", view, WRITTEN_OFFSET, written + 1)
+            return True
+        finally:
+            view.close()
+            os.close(fd)
+
+    def lookup(self, prompt: str, droids: list, threshold: Optional[float] = None) -> Optional[dict]:
+        """Routing of the most similar indexed prompt above threshold, or None."""
+        sig = signature(prompt)
+        if sig is None:
+            return None
+        threshold = _threshold() if threshold is None else threshold
+        opened = self._open(create=False)
+        if opened is None:
+            return None
+        fd, view = opened
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            (written,) = struct.unpack_from("<Q", view, WRITTEN_OFFSET)
+            candidates = set()
+            for offset in _bucket_offsets(sig):
+                candidates.update(n - 1 for n in SLOT_ROW.unpack_from(view, offset) if n)
+
+            best, best_score = None, threshold
+            for entry in candidates:
+                if entry >= written or written - entry > CAPACITY:
+                    continue  # overwritten since it was indexed
+                record = RECORD.unpack_from(view, ENTRIES_OFFSET + (entry % CAPACITY) * RECORD.size)
+                score = similarity(sig, record[0])
+                if score >= best_score:
+                    best, best_score = record, score
+        finally:
+            view.close()
+            os.close(fd)
+
+        if best is None or best[1] >= len(droids):
+            return None
+        _, droid, autonomy, confidence = best
+        return {
+            "droid": droids[droid],
+            "autonomy": AUTONOMY[autonomy] if autonomy < len(AUTONOMY) else "medium",
+            "confidence": round(confidence / 100 * best_score, 2),
+            "reason": f"Similar to a previous prompt (~{best_score:.0%} alike)",
+            "similarity": round(best_score, 3),
+        }
+
+    def count(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(HEADER.size)
+            fields = HEADER.unpack(header)
+        except (OSError, struct.error):
+            return 0
+        if fields[6] != self.version:
+            return 0
+        return min(fields[7], CAPACITY)
+
+
+def clear(path=INDEX_FILE) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
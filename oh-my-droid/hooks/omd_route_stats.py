@@ -0,0 +1,167 @@
+"""
+Router Telemetry for oh-my-droid
+
+Records one fixed-size record per droid exec analysis made by
+intelligent-router.py (latency, return code, outcome, chosen droid) into
+a binary ring at ~/.factory/.omd/router/telemetry.ring, and derives the
+analysis timeout from recent latencies instead of a fixed two minutes:
+
+    timeout = 2 x p99 of the last 200 completed single-prompt calls,
+              clamped to [MIN_TIMEOUT, MAX_TIMEOUT]
+
+Until MIN_SAMPLES calls have completed, or while a quarter of the recent
+calls are timing out (the model got slower; timeouts carry no latency),
+MAX_TIMEOUT is used.
+
+    OMD_ROUTER_TIMEOUT    fixed timeout in seconds (disables adaptation)
+    OMD_ROUTER_TELEMETRY  set to 0 to disable recording
+"""
+
+import os
+import struct
+import threading
+import time
+
+from omd_ring import RingFile, pack_text, percentile, unpack_text
+from omd_route_cache import ROUTER_DIR
+
+TELEMETRY_FILE = ROUTER_DIR / "telemetry.ring"
+CAPACITY = 4096
+
+# timestamp, latency_ms, returncode (-1 when it was stopped or timed out), outcome, kind, droid
+RECORD = struct.Struct("<dIhBB24s")
+
+OUTCOMES = ("ok", "parse-failed", "exit-error", "timeout", "error")
+KINDS = ("single", "batch")
+
+MIN_TIMEOUT = 10.0
+MAX_TIMEOUT = 120.0
+TIMEOUT_FACTOR = 2.0
+WINDOW = 200
+MIN_SAMPLES = 20
+# Back off to MAX_TIMEOUT when this share of the last RECENT calls timed out
+BACKOFF_RATE = 0.25
+RECENT = 20
+
+_ring = None
+_ring_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return os.environ.get("OMD_ROUTER_TELEMETRY", "1") != "0"
+
+
+def get_ring() -> RingFile:
+    global _ring
+    if _ring is None:
+        with _ring_lock:
+            if _ring is None:
+                _ring = RingFile(TELEMETRY_FILE, RECORD, CAPACITY)
+    return _ring
+
+
+def record(latency: float, returncode, outcome: str, droid: str = "", kind: str = "single") -> None:
+    """Append one analysis. Never raises."""
+    if not enabled():
+        return
+    try:
+        get_ring().append(
+            time.time(),
+            min(int(latency * 1000), 0xFFFFFFFF),
+            max(-1, min(returncode if returncode is not None else -1, 0x7FFF)),
+            OUTCOMES.index(outcome) if outcome in OUTCOMES else OUTCOMES.index("error"),
+            KINDS.index(kind) if kind in KINDS else 0,
+            pack_text(droid, 24),
+        )
+    except Exception:
+        pass
+
+
+def read_records() -> list:
+    """All stored analyses as dicts, oldest first."""
+    rows = []
+    try:
+        records = get_ring().records()
+    except OSError:
+        return rows
+    for ts, latency_ms, returncode, outcome, kind, droid in records:
+        rows.append({
+            "timestamp": ts,
+            "latency_ms": latency_ms,
+            "returncode": returncode,
+            "outcome": OUTCOMES[outcome] if outcome < len(OUTCOMES) else "error",
+            "kind": KINDS[kind] if kind < len(KINDS) else "single",
+            "droid": unpack_text(droid),
+        })
+    return rows
+
+
+def completed(row: dict) -> bool:
+    """droid exec answered or exited, so the latency is meaningful"""
+    return row["outcome"] in ("ok", "parse-failed", "exit-error")
+
+
+def adaptive_timeout(rows: list = None) -> float:
+    """Seconds to allow one single-prompt droid exec analysis."""
+    try:
+        fixed = float(os.environ.get("OMD_ROUTER_TIMEOUT", ""))
+        if fixed > 0:
+            return fixed
+    except ValueError:
+        pass
+
+    if rows is None:
+        rows = read_records() if enabled() else []
+    single = [r for r in rows if r["kind"] == "single"][-WINDOW:]
+    recent = single[-RECENT:]
+    if recent and sum(r["outcome"] == "timeout" for r in recent) / len(recent) >= BACKOFF_RATE:
+        return MAX_TIMEOUT
+
+    latencies = sorted(r["latency_ms"] / 1000 for r in single if completed(r))
+    if len(latencies) < MIN_SAMPLES:
+        return MAX_TIMEOUT
+    return round(min(max(percentile(latencies, 99) * TIMEOUT_FACTOR, MIN_TIMEOUT), MAX_TIMEOUT), 1)
+
+
+def summarize(rows: list) -> dict:
+    """Latency percentiles, failure rates and droid distribution"""
+    latencies = sorted(r["latency_ms"] for r in rows if completed(r))
+    outcomes = {}
+    droids = {}
+    for r in rows:
+        outcomes[r["outcome"]] = outcomes.get(r["outcome"], 0) + 1
+        if r["droid"]:
+            droids[r["droid"]] = droids.get(r["droid"], 0) + 1
+
+    def rate(count: int, total: int) -> float:
+        return round(count / total, 3) if total else 0.0
+
+    return {
+        "calls": len(rows),
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0,
+        "timeout_rate": rate(outcomes.get("timeout", 0), len(rows)),
+        "exit_error_rate": rate(outcomes.get("exit-error", 0), len(rows)),
+        # Of the calls that produced output, how many gave no usable answer
+        "parse_failure_rate": rate(outcomes.get("parse-failed", 0),
+                                   outcomes.get("ok", 0) + outcomes.get("parse-failed", 0)),
+        # Answers read before droid exec finished; the process was stopped
+        "early_stops": sum(r["outcome"] == "ok" and r["returncode"] == -1 for r in rows),
+        "outcomes": dict(sorted(outcomes.items())),
+        "droids": dict(sorted(droids.items(), key=lambda item: -item[1])),
+    }
+
+
+def report(since_minutes: float = None) -> dict:
+    rows = read_records()
+    if since_minutes:
+        cutoff = time.time() - since_minutes * 60
+        rows = [r for r in rows if r["timestamp"] >= cutoff]
+    result = {"file": str(TELEMETRY_FILE), "timeout_s": adaptive_timeout()}
+    for kind in KINDS:
+        kind_rows = [r for r in rows if r["kind"] == kind]
+        if kind_rows or kind == "single":
+            result[kind] = summarize(kind_rows)
+    return result
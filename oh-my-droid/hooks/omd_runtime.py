@@ -0,0 +1,185 @@
+"""
+Hook Runtime for oh-my-droid
+
+Loads the hook scripts as modules and runs their handle() functions
+in-process. Used by hook-daemon.py to serve hooks from one long-lived
+interpreter, and by omd-dispatch.py when the daemon is not running.
+
+Every hook script exposes handle(data, *args) -> dict, which takes the
+parsed stdin payload and returns the hook response. EVENTS lists the
+handlers omd-dispatch.py runs for each hook event, in order.
+"""
+
+import importlib.util
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import omd_latency
+
+HOOKS_DIR = Path(__file__).resolve().parent
+
+# Hook name -> script file. Names match the commands in hooks.json.
+HOOKS = {
+    "keyword-detector": "keyword-detector.py",
+    "session-start": "session-start.py",
+    "project-memory": "project-memory.py",
+    "pre-tool-enforcer": "pre-tool-enforcer.py",
+    "post-tool-verifier": "post-tool-verifier.py",
+    "background-manager": "background-manager.py",
+    "persistent-mode": "persistent-mode.py",
+}
+
+# Event -> (hook name, args) handlers, run in order on one parsed payload
+EVENTS = {
+    "UserPromptSubmit": [("keyword-detector", ())],
+    "SessionStart": [("session-start", ()), ("project-memory", ("session-start",))],
+    "PreToolUse": [("pre-tool-enforcer", ())],
+    "PostToolUse": [("post-tool-verifier", ()), ("project-memory", ("post-tool",))],
+    "SubagentStop": [("background-manager", ("hook-complete",))],
+    "PreCompact": [("project-memory", ("pre-compact",))],
+    "Stop": [("persistent-mode", ())],
+}
+
+SUPPRESS = {"continue": True, "suppressOutput": True}
+
+_modules: dict = {}
+_load_lock = threading.Lock()
+
+
+def load_hook(name: str):
+    """Import a hook script, reloading it if the file changed on disk."""
+    script = HOOKS_DIR / HOOKS[name]
+    mtime = os.stat(script).st_mtime_ns
+
+    cached = _modules.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _load_lock:
+        cached = _modules.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        module_name = "omd_hook_" + name.replace("-", "_")
+        spec = importlib.util.spec_from_file_location(module_name, script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[name] = (mtime, module)
+        return module
+
+
+def parse_payload(input_str: str) -> dict:
+    """Parse a hook payload, treating empty or invalid input as {}."""
+    try:
+        data = json.loads(input_str) if input_str.strip() else {}
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _session_id(data: dict) -> str:
+    return str(data.get("session_id", data.get("sessionId", "")) or "")
+
+
+def _hook_label(name: str, args) -> str:
+    return ":".join([name] + [str(a) for a in args])
+
+
+def run_handler(name: str, data: dict, args=(), event: str = "") -> dict:
+    """Run one hook against an already-parsed payload and record its latency."""
+    start = time.perf_counter()
+    error = False
+    try:
+        response = load_hook(name).handle(data, *args)
+    except Exception:
+        response = dict(SUPPRESS)
+        error = True
+
+    omd_latency.record(
+        event or data.get("hook_event_name", "") or "-",
+        _hook_label(name, args),
+        _session_id(data),
+        time.perf_counter() - start,
+        omd_latency.outcome_of(response, error),
+    )
+    return response
+
+
+def run_hook(name: str, args, input_str: str) -> str:
+    """Run one hook against raw stdin text and return its stdout text."""
+    if name not in HOOKS:
+        return json.dumps(SUPPRESS)
+    return json.dumps(run_handler(name, parse_payload(input_str), args))
+
+
+def merge_responses(event: str, responses: list) -> dict:
+    """Combine several hook responses into one, joining additionalContext."""
+    if len(responses) == 1:
+        return responses[0]
+
+    contexts = []
+    for response in responses:
+        specific = response.get("hookSpecificOutput") or {}
+        context = specific.get("additionalContext")
+        if context and context not in contexts:
+            contexts.append(context)
+
+    merged = {"continue": all(r.get("continue", True) for r in responses)}
+    for response in responses:
+        if response.get("stopReason"):
+            merged["stopReason"] = response["stopReason"]
+            break
+
+    if contexts:
+        merged["hookSpecificOutput"] = {
+            "hookEventName": event,
+            "additionalContext": "\n\n".join(contexts),
+        }
+    else:
+        merged["suppressOutput"] = True
+    return merged
+
+
+def dispatch_event(event: str, data: dict) -> dict:
+    """Run every handler registered for an event on one parsed payload."""
+    handlers = EVENTS.get(event)
+    if not handlers:
+        return dict(SUPPRESS)
+
+    start = time.perf_counter()
+    response = merge_responses(
+        event, [run_handler(name, data, args, event) for name, args in handlers]
+    )
+    omd_latency.record(
+        event,
+        omd_latency.EVENT_TOTAL,
+        _session_id(data),
+        time.perf_counter() - start,
+        omd_latency.outcome_of(response),
+    )
+    return response
+
+
+def run_event(event: str, input_str: str) -> str:
+    """Dispatch raw stdin text for an event and return the stdout text."""
+    return json.dumps(dispatch_event(event, parse_payload(input_str)))
+
+
+def start_daemon() -> None:
+    """Launch hook-daemon.py in the background, detached from this process."""
+    import subprocess
+    import sys
+
+    try:
+        subprocess.Popen(
+            [sys.executable, str(HOOKS_DIR / "hook-daemon.py"), "serve"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except Exception:
+        pass
@@ -0,0 +1,122 @@
+"""
+Single-Flight Coalescing for oh-my-droid
+
+Lets concurrent processes that need the same expensive result (e.g.
+intelligent-router.py analyzing the same prompt during an ultrawork
+burst) share one computation. Per key, in a directory:
+
+    <key>.lock  flock held by the process computing the result (leader)
+    <key>.json  {"finished_at": ts, "value": ...} written by the leader
+
+Processes that find the lock taken wait for it, then read the leader's
+result. If the leader died without a result, the next waiter computes
+it. A result finished within SHARE_WINDOW seconds is also reused by
+callers that arrive just after the leader released the lock.
+"""
+
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+SHARE_WINDOW = 2.0
+POLL_INTERVAL = 0.05
+# Lock and result files untouched for this long are removed
+STALE_SECONDS = 600
+
+
+def _read_result(path: Path, since: float):
+    try:
+        data = json.loads(path.read_text())
+        if data["finished_at"] >= since:
+            return True, data["value"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return False, None
+
+
+def _write_result(path: Path, value: Any) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_text(json.dumps({"finished_at": time.time(), "value": value}))
+        os.replace(tmp, path)
+    except (OSError, TypeError, ValueError):
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def sweep(directory: Path) -> None:
+    """Remove stale result files and unlocked stale lock files."""
+    cutoff = time.time() - STALE_SECONDS
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.stat().st_mtime >= cutoff:
+                continue
+            if entry.name.endswith(".lock"):
+                fd = os.open(entry.path, os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    os.unlink(entry.path)
+                finally:
+                    os.close(fd)
+            else:
+                os.unlink(entry.path)
+        except OSError:
+            continue
+
+
+def run(directory: Path, key: str, compute: Callable[[], Any], wait: float) -> Any:
+    """
+    Return compute(), shared with concurrent callers using the same key.
+    The value must be JSON-serializable. Waits at most `wait` seconds for
+    another process's result before computing it here.
+    """
+    arrived = time.time()
+    lock_path = directory / f"{key}.lock"
+    result_path = directory / f"{key}.json"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(lock_path), os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        return compute()
+
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            leader = True
+        except BlockingIOError:
+            leader = False
+
+        if not leader:
+            deadline = arrived + wait
+            while time.time() < deadline:
+                time.sleep(POLL_INTERVAL)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    continue
+            else:
+                return compute()
+            found, value = _read_result(result_path, arrived)
+            if found:
+                return value
+
+        # Leader: reuse a result that finished just before we arrived
+        found, value = _read_result(result_path, arrived - SHARE_WINDOW)
+        if found:
+            return value
+        value = compute()
+        _write_result(result_path, value)
+        sweep(directory)
+        return value
+    finally:
+        os.close(fd)
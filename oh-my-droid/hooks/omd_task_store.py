@@ -0,0 +1,987 @@
+"""
+Task Stores for oh-my-droid
+
+Storage backends behind state-manager.py's StateManager. All of them
+hold whole task dicts; they differ in how tasks are written and found
+again:
+
+    json    one pretty-printed file per task, state/tasks/<id>.json,
+            with an index journal and status counters next to them;
+            finished tasks move to day (or hour) partitions under
+            state/done/, which cleanup deletes whole
+    sqlite  state/tasks.db in WAL mode, with indexed status, session_id
+            and completed_at columns next to the task JSON; summaries
+            are one GROUP BY, updates are transactions
+    events  state/events/: per-task logs of appended changes plus
+            snapshots; updates are appends, listings fold every task
+
+open_store() uses the backend named in state/backend, which migrate()
+writes once the copy is complete; without it, sqlite when state/tasks.db
+exists, events when state/events/ does, and json otherwise.
+OMD_STATE_BACKEND=json, sqlite or events forces one.
+
+Cleanup can archive what it removes instead of dropping it: finished
+tasks are appended to state/archive/<YYYY-MM-DD>.jsonl.gz, one gzip'd
+JSONL file per completion day.
+"""
+
+import fcntl
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+BACKENDS = ("json", "sqlite", "events")
+DB_FILE = "tasks.db"
+BACKEND_FILE = "backend"
+EVENTS_DIR = "events"
+ARCHIVE_DIR = "archive"
+
+FINISHED = ("completed", "error")
+
+_MISSING = object()
+
+
+def _status_change(previous: Optional[str], status: Optional[str]) -> Dict[Optional[str], int]:
+    """Status count deltas for one task moving from previous to status"""
+    if previous == status:
+        return {}
+    return {previous: -1, status: 1}
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _archive(archive_dir: Path, tasks: Iterable[Dict[str, Any]]) -> int:
+    """Append tasks to archive_dir/<completion day>.jsonl.gz; the number written"""
+    days = {}
+    for task in tasks:
+        day = (task.get("completed_at") or _now())[:10]
+        days.setdefault(day, []).append(json.dumps(task, ensure_ascii=False) + "\n")
+    if days:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+    for day, lines in days.items():
+        # Each append adds a gzip member; readers see one concatenated stream
+        with gzip.open(archive_dir / f"{day}.jsonl.gz", "at", encoding="utf-8") as f:
+            f.write("".join(lines))
+    return sum(len(lines) for lines in days.values())
+
+
+def _replace(path: Path, text: str, sync: bool = False) -> None:
+    """Write path through a temp file and a rename; with sync, fsync the temp file first"""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _fsync_dirs(directories: Iterable[Path]) -> None:
+    """fsync directories, making the files created, renamed or removed in them durable"""
+    for directory in directories:
+        try:
+            fd = os.open(str(directory), os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class TaskStore:
+    """Interface shared by the backends."""
+
+    name = ""
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, task: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def put_many(self, tasks: list, sync: bool = False) -> None:
+        """Save tasks; with sync, they are on disk when this returns."""
+        for task in tasks:
+            self.put(task)
+
+    def update(self, task_id: str,
+               mutate: Callable[[Dict[str, Any]], None]) -> Optional[Dict[str, Any]]:
+        """Apply mutate to a stored task and save it; the new task, or None if missing."""
+        raise NotImplementedError
+
+    def tasks(self, session_id: Optional[str] = None,
+              statuses: Optional[Iterable[str]] = None) -> list:
+        raise NotImplementedError
+
+    def counts(self) -> Dict[str, int]:
+        """Number of tasks per status."""
+        raise NotImplementedError
+
+    def remove_finished(self, before: str, archive: bool = False) -> int:
+        """
+        Delete finished tasks whose completed_at (ISO) is before `before`;
+        with archive, append them to the per-day archive first.
+        """
+        raise NotImplementedError
+
+    def check(self, repair: bool = True) -> Dict[str, Any]:
+        """Verify (and repair) derived data such as indexes."""
+        return {"backend": self.name, "drifted": 0, "rebuilt": False}
+
+    def compact(self) -> Dict[str, Any]:
+        """Fold update logs into snapshots, where the backend has them."""
+        return {"backend": self.name, "compacted": 0}
+
+    def close(self) -> None:
+        pass
+
+
+class JsonTaskStore(TaskStore):
+    """
+    One JSON file per task under <state>/tasks/, plus an index so that
+    summaries and filtered listings do not parse every task:
+
+        task-index.jsonl  one line per save: {"id", "status", "session_id",
+                          "created_at", "completed_at", "partition",
+                          "mtime_ns"}, or {"id", "removed": true}, or
+                          {"partition", "removed": true} for a whole
+                          partition; the last line per id wins
+        task-counts.json  tasks per status, replaced on each save
+        task-partitions.json
+                          tasks per status in each partition (see below)
+
+    All are written under task-index.lock, which is also held from
+    reading a task's previous status to writing it, so concurrent saves
+    of one task never count it twice or leave it in two places. The
+    journal is compacted once it holds more than twice as many lines as
+    live tasks. check() compares the index with the files (by mtime) and
+    rebuilds it if they drifted, e.g. after tasks were edited or deleted
+    by hand.
+
+    A task that finishes moves to done/<YYYY-MM-DD>/ (done/<YYYY-MM-DDTHH>/
+    with OMD_STATE_PARTITION=hour) by its completed_at, and back to tasks/
+    if it is restarted; its index entry names the partition. Cleanup
+    deletes whole partitions that ended before the cutoff without opening
+    their tasks, so a partition overlapping the cutoff is kept until all
+    of it has expired. It settles the counters from task-partitions.json
+    and writes one journal line per partition, so it costs the same for
+    ten tasks as for ten thousand.
+    """
+
+    name = "json"
+
+    INDEX_FILE = "task-index.jsonl"
+    COUNTS_FILE = "task-counts.json"
+    PARTITION_COUNTS_FILE = "task-partitions.json"
+    LOCK_FILE = "task-index.lock"
+    DONE_DIR = "done"
+    COMPACT_MIN_LINES = 1000
+
+    # Partition name formats and spans; the name is a completed_at prefix
+    PARTITIONS = {
+        "day": ("%Y-%m-%d", timedelta(days=1)),
+        "hour": ("%Y-%m-%dT%H", timedelta(hours=1)),
+    }
+
+    def __init__(self, state_dir: Path):
+        state_dir = Path(state_dir)
+        self.task_dir = state_dir / "tasks"
+        self.done_dir = state_dir / self.DONE_DIR
+        self.archive_dir = state_dir / ARCHIVE_DIR
+        self.index_path = state_dir / self.INDEX_FILE
+        self.counts_path = state_dir / self.COUNTS_FILE
+        self.partition_counts_path = state_dir / self.PARTITION_COUNTS_FILE
+        self.lock_path = state_dir / self.LOCK_FILE
+        granularity = os.environ.get("OMD_STATE_PARTITION", "day")
+        self.partition_len = len("YYYY-MM-DDTHH" if granularity == "hour" else "YYYY-MM-DD")
+
+    def _path(self, task_id: str) -> Path:
+        return self.task_dir / f"{task_id}.json"
+
+    def _partition(self, task: Dict[str, Any]) -> Optional[str]:
+        """Partition a task belongs in; None while it is not finished"""
+        if task.get("status") not in FINISHED:
+            return None
+        return (task.get("completed_at") or _now())[:self.partition_len]
+
+    def _partitions(self) -> list:
+        """Partition names, newest first"""
+        try:
+            return sorted((e.name for e in os.scandir(self.done_dir) if e.is_dir()), reverse=True)
+        except OSError:
+            return []
+
+    def _partition_end(self, partition: str) -> Optional[datetime]:
+        for fmt, span in self.PARTITIONS.values():
+            try:
+                return datetime.strptime(partition, fmt) + span
+            except ValueError:
+                continue
+        return None
+
+    def _locate(self, task_id: str, partitions: Optional[list] = None) -> Optional[Path]:
+        """A task's file: in tasks/, else in the newest partition holding it"""
+        path = self._path(task_id)
+        if path.exists():
+            return path
+        for partition in self._partitions() if partitions is None else partitions:
+            path = self.done_dir / partition / f"{task_id}.json"
+            if path.exists():
+                return path
+        return None
+
+    @contextmanager
+    def _locked(self):
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _read(self, task_id: str, partitions: Optional[list] = None) -> tuple:
+        """(path, task), or (None, None) if there is no such task"""
+        for _ in range(2):
+            path = self._locate(task_id, partitions)
+            if path is None:
+                break
+            try:
+                return path, json.loads(path.read_text())
+            except FileNotFoundError:
+                continue  # moved to or from a partition meanwhile; look again
+        return None, None
+
+    def get(self, task_id):
+        return self._read(task_id)[1]
+
+    def _status_of(self, task_id: str, partitions: Optional[list] = None) -> tuple:
+        """(path, status) of a stored task; (None, None) if missing or unreadable"""
+        try:
+            path, task = self._read(task_id, partitions)
+            return path, task.get("status")
+        except (AttributeError, json.JSONDecodeError, OSError):
+            return None, None
+
+    def _write(self, task: Dict[str, Any], current: Optional[Path] = None,
+               sync: bool = False) -> Dict[str, Any]:
+        """Write a task file where its status puts it, removing current if elsewhere; its index entry"""
+        partition = self._partition(task)
+        path = self._path(task["id"]) if partition is None \
+            else self.done_dir / partition / f"{task['id']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Through a temp file, so concurrent readers never see half a task
+        _replace(path, json.dumps(task, indent=2, ensure_ascii=False), sync)
+        if current is not None and current != path:
+            try:
+                current.unlink()
+            except OSError:
+                pass
+        return self._entry(task, path.stat().st_mtime_ns, partition)
+
+    @staticmethod
+    def _entry(task: Dict[str, Any], mtime_ns: int, partition: Optional[str]) -> Dict[str, Any]:
+        return {
+            "id": task["id"],
+            "status": task.get("status"),
+            "session_id": task.get("session_id"),
+            "created_at": task.get("created_at"),
+            "completed_at": task.get("completed_at"),
+            "partition": partition,
+            "mtime_ns": mtime_ns,
+        }
+
+    def _partition_change(self, current: Optional[Path], previous: Optional[str],
+                          entry: Dict[str, Any], changes: Optional[dict] = None) -> dict:
+        """Add the per-partition count changes of a task written as entry to changes"""
+        changes = {} if changes is None else changes
+        if current is not None and current.parent.parent == self.done_dir and previous:
+            counts = changes.setdefault(current.parent.name, {})
+            counts[previous] = counts.get(previous, 0) - 1
+        if entry["partition"] is not None:
+            counts = changes.setdefault(entry["partition"], {})
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return changes
+
+    def put(self, task):
+        with self._locked():
+            current, previous = self._status_of(task["id"])
+            entry = self._write(task, current)
+            self._record_locked([entry], _status_change(previous, task.get("status")),
+                                partitions=self._partition_change(current, previous, entry))
+
+    def put_many(self, tasks, sync=False):
+        # One index append and one counters rewrite for the whole batch
+        entries, deltas, directories, changes = [], {}, set(), {}
+        with self._locked():
+            partitions = self._partitions()
+            for task in tasks:
+                current, previous = self._status_of(task["id"], partitions)
+                entry = self._write(task, current, sync)
+                entries.append(entry)
+                self._partition_change(current, previous, entry, changes)
+                directories.add(self.task_dir if entry["partition"] is None
+                                else self.done_dir / entry["partition"])
+                if current is not None:
+                    directories.add(current.parent)
+                for status, delta in _status_change(previous, task.get("status")).items():
+                    deltas[status] = deltas.get(status, 0) + delta
+            if entries:
+                self._record_locked(entries, deltas, sync, changes)
+        if sync:
+            # Then each directory once, for the new names (and new partitions)
+            _fsync_dirs(sorted(directories) + [self.done_dir, self.lock_path.parent])
+
+    def update(self, task_id, mutate):
+        with self._locked():
+            current, task = self._read(task_id)
+            if not task:
+                return None
+            previous = task.get("status")
+            mutate(task)
+            entry = self._write(task, current)
+            self._record_locked([entry], _status_change(previous, task.get("status")),
+                                partitions=self._partition_change(current, previous, entry))
+        return task
+
+    def _record_locked(self, entries: list, deltas: Dict[Optional[str], int], sync: bool = False,
+                       partitions: Optional[dict] = None) -> None:
+        """Append index entries and apply status and partition count changes (lock held)"""
+        deltas.pop(None, None)
+        if not self._index_complete():
+            # No index yet (or deleted): derive it from the files
+            self._rebuild_locked(sync)
+            return
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        counts = self._read_counts()
+        for status, delta in deltas.items():
+            counts[status] = max(counts.get(status, 0) + delta, 0)
+        self._write_counts(counts, sync)
+        if partitions:
+            by_partition = self._read_partition_counts()
+            for partition, changes in partitions.items():
+                partition_counts = by_partition.setdefault(partition, {})
+                for status, delta in changes.items():
+                    partition_counts[status] = max(partition_counts.get(status, 0) + delta, 0)
+            self._write_partition_counts(by_partition, sync)
+
+    def _index_complete(self) -> bool:
+        return all(path.exists() for path in
+                   (self.index_path, self.counts_path, self.partition_counts_path))
+
+    def _read_counts(self) -> Dict[str, int]:
+        try:
+            counts = json.loads(self.counts_path.read_text())
+            return counts if isinstance(counts, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_counts(self, counts: Dict[str, int], sync: bool = False) -> None:
+        # Replaced whole: counts() reads without the lock
+        _replace(self.counts_path, json.dumps({k: v for k, v in counts.items() if v}), sync)
+
+    def _read_partition_counts(self) -> Dict[str, Dict[str, int]]:
+        try:
+            counts = json.loads(self.partition_counts_path.read_text())
+            return counts if isinstance(counts, dict) else {}
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_partition_counts(self, by_partition: Dict[str, Dict[str, int]],
+                                sync: bool = False) -> None:
+        compact = {}
+        for partition, counts in sorted(by_partition.items()):
+            counts = {k: v for k, v in counts.items() if v}
+            if counts:
+                compact[partition] = counts
+        _replace(self.partition_counts_path, json.dumps(compact), sync)
+
+    def _fold(self) -> tuple:
+        """Live index entries by id, and the journal's line count"""
+        entries, lines = {}, 0
+        members = {}  # partition -> ids entered into it
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if entry.get("removed") and "id" not in entry:
+                        # A whole partition was dropped
+                        for task_id in members.pop(entry.get("partition"), ()):
+                            if entries.get(task_id, {}).get("partition") == entry.get("partition"):
+                                del entries[task_id]
+                    elif entry.get("removed"):
+                        entries.pop(entry.get("id"), None)
+                    else:
+                        entries[entry["id"]] = entry
+                        if entry.get("partition"):
+                            members.setdefault(entry["partition"], set()).add(entry["id"])
+        except OSError:
+            return None, 0
+        return entries, lines
+
+    def index(self) -> Dict[str, Dict[str, Any]]:
+        """Live index entries by task id (rebuilt when missing, compacted when bloated)"""
+        entries, lines = self._fold()
+        if entries is None or not self._index_complete():
+            # No index yet (or deleted): derive it from the files
+            with self._locked():
+                return self._rebuild_locked()
+        if lines > max(2 * len(entries), self.COMPACT_MIN_LINES):
+            with self._locked():
+                entries, _ = self._fold()
+                self._write_index(entries.values())
+        return entries
+
+    def _write_index(self, entries: Iterable[Dict[str, Any]], sync: bool = False) -> None:
+        _replace(self.index_path, "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries), sync)
+
+    def _directories(self) -> list:
+        """tasks/ and every partition, newest first"""
+        return [self.task_dir] + [self.done_dir / p for p in self._partitions()]
+
+    def _scan(self, directories: Optional[list] = None) -> Iterable[tuple]:
+        """(path, task) for every readable task file in directories (default: all)"""
+        for directory in self._directories() if directories is None else directories:
+            for file in directory.glob("*.json"):
+                try:
+                    yield file, json.loads(file.read_text())
+                except (json.JSONDecodeError, OSError):
+                    continue
+
+    def _rebuild_locked(self, sync: bool = False) -> Dict[str, Dict[str, Any]]:
+        entries, counts, by_partition = {}, {}, {}
+        for file, task in self._scan():
+            # Seen twice while it moves between partitions: keep the first
+            if not isinstance(task, dict) or "id" not in task or task["id"] in entries:
+                continue
+            partition = None if file.parent == self.task_dir else file.parent.name
+            try:
+                entries[task["id"]] = self._entry(task, file.stat().st_mtime_ns, partition)
+            except OSError:
+                continue
+            counts[task.get("status")] = counts.get(task.get("status"), 0) + 1
+            if partition is not None:
+                partition_counts = by_partition.setdefault(partition, {})
+                partition_counts[task.get("status")] = partition_counts.get(task.get("status"), 0) + 1
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_index(entries.values(), sync)
+        self._write_counts(counts, sync)
+        self._write_partition_counts(by_partition, sync)
+        return entries
+
+    def rebuild(self) -> int:
+        """Rebuild the index and counters from the task files"""
+        with self._locked():
+            return len(self._rebuild_locked())
+
+    def check(self, repair: bool = True) -> Dict[str, Any]:
+        entries = self.index()
+        files = {}
+        for directory in self._directories():
+            try:
+                for entry in os.scandir(directory):
+                    if entry.name.endswith(".json"):
+                        files.setdefault(entry.name[:-len(".json")], entry.stat().st_mtime_ns)
+            except OSError:
+                continue
+        counts, by_partition = {}, {}
+        for entry in entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+            if entry.get("partition"):
+                partition_counts = by_partition.setdefault(entry["partition"], {})
+                partition_counts[entry["status"]] = partition_counts.get(entry["status"], 0) + 1
+
+        drift = sorted(
+            set(files) ^ set(entries)
+            | {i for i in set(files) & set(entries) if files[i] != entries[i].get("mtime_ns")}
+        )
+        counts_drift = ({k: v for k, v in counts.items() if v} != self._read_counts()
+                        or by_partition != self._read_partition_counts())
+        result = {"backend": self.name, "tasks": len(files), "drifted": len(drift),
+                  "counts_drifted": counts_drift, "rebuilt": False}
+        if (drift or counts_drift) and repair:
+            result["tasks"] = self.rebuild()
+            result["rebuilt"] = True
+        return result
+
+    def _tasks_by_id(self, ids: Iterable[str]) -> list:
+        tasks = []
+        for task_id in sorted(ids):
+            try:
+                task = self.get(task_id)
+            except (json.JSONDecodeError, OSError):
+                continue
+            if task:
+                tasks.append(task)
+        return tasks
+
+    def tasks(self, session_id=None, statuses=None):
+        if session_id is None and statuses is None:
+            return [task for _, task in self._scan()]
+        statuses = set(statuses) if statuses is not None else None
+        return self._tasks_by_id(
+            task_id for task_id, e in self.index().items()
+            if (session_id is None or e.get("session_id") == session_id)
+            and (statuses is None or e.get("status") in statuses)
+        )
+
+    def counts(self):
+        if not self._index_complete():
+            self.index()
+        return self._read_counts()
+
+    def remove_finished(self, before, archive=False):
+        cutoff = datetime.fromisoformat(before).replace(tzinfo=None)
+        dropped = []
+        for partition in self._partitions():
+            end = self._partition_end(partition)
+            if end is None or end > cutoff:
+                continue
+            directory = self.done_dir / partition
+            if archive:
+                _archive(self.archive_dir, (task for _, task in self._scan([directory])
+                                            if isinstance(task, dict)))
+            shutil.rmtree(directory, ignore_errors=True)
+            dropped.append(partition)
+
+        removed = 0
+        with self._locked():
+            if not self._index_complete():
+                self._rebuild_locked()
+            by_partition = self._read_partition_counts()
+            counts = self._read_counts()
+            if dropped:
+                # Settle the counters per partition; no task or index entry is read
+                for partition in dropped:
+                    for status, count in by_partition.pop(partition, {}).items():
+                        counts[status] = max(counts.get(status, 0) - count, 0)
+                        removed += count
+                with open(self.index_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps({"partition": p, "removed": True}) + "\n"
+                                    for p in dropped))
+                self._write_counts(counts)
+                self._write_partition_counts(by_partition)
+            partitioned = sum(count for partition_counts in by_partition.values()
+                              for status, count in partition_counts.items() if status in FINISHED)
+            # Finished tasks outside the partitions: left from before partitioning
+            legacy = sum(counts.get(status, 0) for status in FINISHED) > partitioned
+        if legacy:
+            removed += self._remove_unpartitioned(before, archive)
+        return removed
+
+    def _remove_unpartitioned(self, before: str, archive: bool) -> int:
+        """Remove finished tasks still in tasks/ (finished before partitioning), one by one"""
+        legacy = [
+            e for e in self.index().values()
+            if e.get("status") in FINISHED and not e.get("partition")
+            and e.get("completed_at") and e["completed_at"] < before
+        ]
+        if archive and legacy:
+            _archive(self.archive_dir, filter(None, (self.get(e["id"]) for e in legacy)))
+        gone, deltas = [], {}
+        with self._locked():
+            for entry in legacy:
+                # Re-read under the lock: it may have been restarted since
+                _, status = self._status_of(entry["id"], [])
+                if status not in FINISHED:
+                    continue
+                try:
+                    self._path(entry["id"]).unlink()
+                except OSError:
+                    continue
+                gone.append({"id": entry["id"], "removed": True})
+                deltas[status] = deltas.get(status, 0) - 1
+            if gone:
+                self._record_locked(gone, deltas)
+        return len(gone)
+
+
+class SqliteTaskStore(TaskStore):
+    """Tasks in one SQLite database in WAL mode."""
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            id           TEXT PRIMARY KEY,
+            status       TEXT,
+            session_id   TEXT,
+            created_at   TEXT,
+            completed_at TEXT,
+            data         TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+        CREATE INDEX IF NOT EXISTS tasks_session ON tasks (session_id);
+        CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed_at);
+    """
+
+    def __init__(self, state_dir: Path):
+        self.path = Path(state_dir) / DB_FILE
+        self.archive_dir = Path(state_dir) / ARCHIVE_DIR
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; transactions are opened explicitly where needed
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _row(task: Dict[str, Any]) -> tuple:
+        return (
+            task["id"],
+            task.get("status"),
+            task.get("session_id"),
+            task.get("created_at"),
+            task.get("completed_at"),
+            json.dumps(task, ensure_ascii=False),
+        )
+
+    def get(self, task_id):
+        row = self.db.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, task):
+        self.put_many([task])
+
+    def put_many(self, tasks, sync=False):
+        if sync:
+            # FULL syncs the WAL once at this commit; NORMAL leaves it to checkpoints
+            self.db.execute("PRAGMA synchronous=FULL")
+        try:
+            with self.transaction():
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+                    [self._row(t) for t in tasks],
+                )
+        finally:
+            if sync:
+                self.db.execute("PRAGMA synchronous=NORMAL")
+
+    def transaction(self):
+        return _Transaction(self.db)
+
+    def update(self, task_id, mutate):
+        # BEGIN IMMEDIATE takes the write lock first, so concurrent
+        # read-modify-write updates cannot lose each other's changes
+        with self.transaction():
+            row = self.db.execute("SELECT data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if not row:
+                return None
+            task = json.loads(row[0])
+            mutate(task)
+            self.db.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+                            self._row(task))
+        return task
+
+    def tasks(self, session_id=None, statuses=None):
+        query, params = "SELECT data FROM tasks", []
+        clauses = []
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            params.append(session_id)
+        if statuses is not None:
+            statuses = list(statuses)
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return [json.loads(row[0]) for row in self.db.execute(query + " ORDER BY id", params)]
+
+    def counts(self):
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+
+    def remove_finished(self, before, archive=False):
+        where = (f"WHERE status IN ({', '.join('?' * len(FINISHED))}) "
+                 "AND completed_at IS NOT NULL AND completed_at < ?")
+        with self.transaction():
+            if archive:
+                _archive(self.archive_dir, (json.loads(row[0]) for row in self.db.execute(
+                    f"SELECT data FROM tasks {where}", (*FINISHED, before))))
+            cursor = self.db.execute(f"DELETE FROM tasks {where}", (*FINISHED, before))
+        return cursor.rowcount
+
+    def close(self):
+        self.db.close()
+
+
+class EventTaskStore(TaskStore):
+    """
+    Event-sourced tasks under <state>/events/, for many agents updating
+    the same tasks at once:
+
+        <id>.log   one JSON line per change, {"at", "set": {...}} (and
+                   "unset": [...] for removed keys), appended with O_APPEND
+        <id>.snap  {"offset", "task"}: the task folded up to byte offset
+
+    A task is its snapshot plus the log lines after it. An update appends
+    only the fields it changed, so concurrent updates of different fields
+    never overwrite each other; every SNAPSHOT_EVERY events the appender
+    refreshes the snapshot. Events set whole values, so replaying them
+    twice is harmless: compact() snapshots each task at offset 0 and then
+    truncates its log.
+    """
+
+    name = "events"
+
+    LOG_SUFFIX = ".log"
+    SNAP_SUFFIX = ".snap"
+    DEFAULT_SNAPSHOT_EVERY = 50
+
+    def __init__(self, state_dir: Path):
+        self.event_dir = Path(state_dir) / EVENTS_DIR
+        self.archive_dir = Path(state_dir) / ARCHIVE_DIR
+        try:
+            self.snapshot_every = max(1, int(os.environ.get(
+                "OMD_STATE_SNAPSHOT_EVERY", self.DEFAULT_SNAPSHOT_EVERY)))
+        except ValueError:
+            self.snapshot_every = self.DEFAULT_SNAPSHOT_EVERY
+
+    def _log(self, task_id: str) -> Path:
+        return self.event_dir / f"{task_id}{self.LOG_SUFFIX}"
+
+    def _snap(self, task_id: str) -> Path:
+        return self.event_dir / f"{task_id}{self.SNAP_SUFFIX}"
+
+    def _fold(self, task_id: str) -> tuple:
+        """(task or None, events after the snapshot, log size folded)"""
+        task, offset = None, 0
+        try:
+            snap = json.loads(self._snap(task_id).read_text())
+            task, offset = snap["task"], snap["offset"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        try:
+            with open(self._log(task_id), "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+        except OSError:
+            return task, 0, offset
+        # A line without its newline is still being written; leave it
+        end = tail.rfind(b"\n") + 1
+        events = 0
+        for line in tail[:end].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            task = dict(task or {})
+            task.update(event.get("set", {}))
+            for key in event.get("unset", []):
+                task.pop(key, None)
+            events += 1
+        return task, events, offset + end
+
+    def _append(self, task_id: str, event: Dict[str, Any], create: bool = True,
+                sync: bool = False) -> bool:
+        """Append one event; without create, False if the task's log is gone."""
+        self.event_dir.mkdir(parents=True, exist_ok=True)
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        flags = os.O_WRONLY | os.O_APPEND | (os.O_CREAT if create else 0)
+        try:
+            fd = os.open(str(self._log(task_id)), flags, 0o600)
+        except FileNotFoundError:
+            return False
+        try:
+            # Shared: appends run concurrently, compaction excludes them
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            os.write(fd, line)
+            if sync:
+                os.fsync(fd)
+            return True
+        finally:
+            os.close(fd)
+
+    def _write_snapshot(self, task_id: str, task: Dict[str, Any], offset: int) -> None:
+        _replace(self._snap(task_id), json.dumps({"offset": offset, "task": task}, ensure_ascii=False))
+
+    def get(self, task_id):
+        return self._fold(task_id)[0]
+
+    def put(self, task, sync=False):
+        event = {"at": _now(), "set": task}
+        # Over an existing task (e.g. migrating again), drop keys it no longer has
+        before = self._fold(task["id"])[0] or {}
+        unset = [k for k in before if k not in task]
+        if unset:
+            event["unset"] = unset
+        self._append(task["id"], event, sync=sync)
+
+    def put_many(self, tasks, sync=False):
+        for task in tasks:
+            self.put(task, sync)
+        if sync:
+            _fsync_dirs([self.event_dir])
+
+    def update(self, task_id, mutate):
+        before, events, _ = self._fold(task_id)
+        if not before:
+            return None
+        task = json.loads(json.dumps(before))
+        mutate(task)
+        event = {"at": _now(), "set": {k: v for k, v in task.items() if before.get(k, _MISSING) != v}}
+        unset = [k for k in before if k not in task]
+        if unset:
+            event["unset"] = unset
+        if not self._append(task_id, event, create=False):
+            return None  # removed meanwhile; do not leave a partial task behind
+
+        if events + 1 >= self.snapshot_every:
+            self._snapshot(task_id)
+        return task
+
+    def _snapshot(self, task_id: str, truncate: bool = False) -> int:
+        """
+        Fold the log into the snapshot while holding appends off, and
+        optionally empty the log. Returns the log bytes folded.
+        """
+        try:
+            fd = os.open(str(self._log(task_id)), os.O_RDWR)
+        except OSError:
+            return 0
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            task, _, offset = self._fold(task_id)
+            if task is None:
+                return 0
+            if truncate:
+                # The snapshot goes first: if the truncate never happens,
+                # replaying the log over it yields the same task
+                self._write_snapshot(task_id, task, 0)
+                os.ftruncate(fd, 0)
+            else:
+                self._write_snapshot(task_id, task, offset)
+            return offset
+        finally:
+            os.close(fd)
+
+    def _ids(self) -> list:
+        try:
+            return sorted(
+                e.name[:-len(self.LOG_SUFFIX)] for e in os.scandir(self.event_dir)
+                if e.name.endswith(self.LOG_SUFFIX)
+            )
+        except OSError:
+            return []
+
+    def tasks(self, session_id=None, statuses=None):
+        statuses = set(statuses) if statuses is not None else None
+        tasks = []
+        for task_id in self._ids():
+            task = self.get(task_id)
+            if task and (session_id is None or task.get("session_id") == session_id) \
+                    and (statuses is None or task.get("status") in statuses):
+                tasks.append(task)
+        return tasks
+
+    def counts(self):
+        counts = {}
+        for task in self.tasks():
+            counts[task.get("status")] = counts.get(task.get("status"), 0) + 1
+        return counts
+
+    def remove_finished(self, before, archive=False):
+        expired = [task for task in self.tasks(statuses=FINISHED)
+                   if task.get("completed_at") and task["completed_at"] < before]
+        if archive:
+            _archive(self.archive_dir, expired)
+        removed = 0
+        for task in expired:
+            try:
+                fd = os.open(str(self._log(task["id"])), os.O_RDWR)
+            except OSError:
+                continue
+            try:
+                # Exclusive, like compaction: no append lands between the two unlinks
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                for path in (self._snap(task["id"]), self._log(task["id"])):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                removed += 1
+            finally:
+                os.close(fd)
+        return removed
+
+    def compact(self) -> Dict[str, Any]:
+        """Fold every log into its snapshot and empty the log"""
+        compacted, freed = 0, 0
+        for task_id in self._ids():
+            folded = self._snapshot(task_id, truncate=True)
+            if folded:
+                compacted += 1
+                freed += folded
+        return {"backend": self.name, "compacted": compacted, "bytes_freed": freed}
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error) on an autocommit connection."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def backend_name(state_dir: Path) -> str:
+    name = os.environ.get("OMD_STATE_BACKEND", "")
+    if name in BACKENDS:
+        return name
+    try:
+        name = (Path(state_dir) / BACKEND_FILE).read_text().strip()
+    except OSError:
+        name = ""
+    if name in BACKENDS:
+        return name
+    if (Path(state_dir) / DB_FILE).exists():
+        return "sqlite"
+    return "events" if (Path(state_dir) / EVENTS_DIR).is_dir() else "json"
+
+
+def open_store(state_dir: Path, name: Optional[str] = None) -> TaskStore:
+    name = name or backend_name(state_dir)
+    if name == "sqlite":
+        return SqliteTaskStore(state_dir)
+    if name == "events":
+        return EventTaskStore(state_dir)
+    return JsonTaskStore(state_dir)
+
+
+def migrate(state_dir: Path, source: str = "json", target: str = "sqlite") -> int:
+    """
+    Copy every task from one backend to the other and make the target the
+    active backend; returns the count.
+    """
+    src = open_store(state_dir, source)
+    dst = open_store(state_dir, target)
+    try:
+        tasks = src.tasks()
+        dst.put_many(tasks)
+    finally:
+        src.close()
+        dst.close()
+    marker = Path(state_dir) / BACKEND_FILE
+    tmp = marker.with_name(f"{BACKEND_FILE}.{os.getpid()}.tmp")
+    tmp.write_text(target + "\n")
+    os.replace(tmp, marker)
+    return len(tasks)
@@ -0,0 +1,70 @@
+"""
+Hook Trace Capture for oh-my-droid
+
+Opt-in capture of hook payloads (stdin) and responses (stdout) as JSONL,
+for replay with omd-replay.py. Enabled by OMD_CAPTURE:
+
+    OMD_CAPTURE=1              append to ~/.factory/.omd/traces/<date>.jsonl
+    OMD_CAPTURE=/path/x.jsonl  append to that file
+
+Each line is one invocation; records are written with a single O_APPEND
+write so concurrent hooks do not interleave.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+TRACES_DIR = Path.home() / ".factory" / ".omd" / "traces"
+
+
+def capture_path():
+    value = os.environ.get("OMD_CAPTURE", "")
+    if not value or value == "0":
+        return None
+    if value == "1":
+        return TRACES_DIR / f"{time.strftime('%Y-%m-%d')}.jsonl"
+    return Path(value).expanduser()
+
+
+def capture(kind: str, name: str, args: list, cwd: str, payload: bytes,
+            reply: str, started: float, duration: float) -> None:
+    """Append one invocation to the trace. Never raises."""
+    path = capture_path()
+    if path is None:
+        return
+    try:
+        line = json.dumps({
+            "ts": started,
+            "kind": kind,
+            "name": name,
+            "args": list(args),
+            "cwd": cwd,
+            "input": payload.decode("utf-8", "replace"),
+            "output": reply.strip(),
+            "duration_ms": round(duration * 1000, 3),
+        }) + "\n"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    except Exception:
+        pass
+
+
+def load_trace(path) -> list:
+    """Read a trace file, skipping malformed lines."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
@@ -12,9 +12,10 @@ Supported modes: ralph, autopilot, ultrawork, ecomode, pipeline
 import json
 import sys
 import os
-from pathlib import Path
 from datetime import datetime
 
+import omd_modes
+
 
 STALE_THRESHOLD_HOURS = 2
 
@@ -26,26 +27,6 @@ def read_stdin():
         return ""
 
 
-def read_json_file(path):
-    try:
-        p = Path(path)
-        if p.exists():
-            return json.loads(p.read_text())
-    except Exception:
-        pass
-    return None
-
-
-def write_json_file(path, data):
-    try:
-        p = Path(path)
-        p.parent.mkdir(parents=True, exist_ok=True)
-        p.write_text(json.dumps(data, indent=2))
-        return True
-    except Exception:
-        return False
-
-
 def is_stale_state(state):
     if not state:
         return True
@@ -73,30 +54,18 @@ def is_stale_state(state):
         return True
 
 
-def get_state_path(directory, mode_name, session_id=""):
-    if session_id:
-        return (
-            Path(directory)
-            / ".omd"
-            / "state"
-            / "sessions"
-            / session_id
-            / f"{mode_name}-state.json"
-        )
-    return Path(directory) / ".omd" / "state" / f"{mode_name}-state.json"
-
-
 def get_active_modes(directory, session_id=""):
     modes = ["ralph", "autopilot", "ultrawork", "ecomode", "pipeline"]
     active = []
 
+    session_modes = omd_modes.read_modes(directory, session_id) if session_id else {}
+    project_modes = omd_modes.read_modes(directory)
+
     for mode in modes:
-        state = read_json_file(get_state_path(directory, mode, session_id))
-        if not state:
-            state = read_json_file(get_state_path(directory, mode))
+        state = session_modes.get(mode) or project_modes.get(mode)
 
         if state and state.get("active") and not is_stale_state(state):
-            active.append({"name": mode, "state": state})
+            active.append({"name": mode, "state": dict(state)})
 
     return active
 
@@ -108,6 +77,7 @@ def generate_continuation(active_modes, directory, session_id):
     mode_names = [m["name"] for m in active_modes]
 
     messages = []
+    updates = {}
     for mode in active_modes:
         name = mode["name"]
         state = mode["state"]
@@ -117,8 +87,7 @@ def generate_continuation(active_modes, directory, session_id):
         # Update reinforcement count
         state["reinforcement_count"] = count
         state["last_checked_at"] = datetime.now().isoformat()
-        state_path = get_state_path(directory, name, session_id)
-        write_json_file(str(state_path), state)
+        updates[name] = state
 
         if name == "ralph":
             messages.append(
@@ -154,6 +123,8 @@ def generate_continuation(active_modes, directory, session_id):
                 f"Continue with next pipeline stage."
             )
 
+    omd_modes.update_modes(directory, updates, session_id)
+
     combined = "\n\n---\n\n".join(messages)
     return (
         f"<persistent-mode>\n\n"
@@ -164,43 +135,40 @@ def generate_continuation(active_modes, directory, session_id):
     )
 
 
-def main():
+def handle(data):
     try:
-        input_str = read_stdin()
-        data = {}
-        try:
-            data = json.loads(input_str)
-        except Exception:
-            pass
-
         directory = data.get("cwd", data.get("directory", os.getcwd()))
         session_id = data.get("session_id", data.get("sessionId", ""))
 
         active_modes = get_active_modes(directory, session_id)
 
         if not active_modes:
-            print(json.dumps({"continue": True, "suppressOutput": True}))
-            return
+            return {"continue": True, "suppressOutput": True}
 
         continuation = generate_continuation(active_modes, directory, session_id)
 
         if continuation:
-            print(
-                json.dumps(
-                    {
-                        "continue": True,
-                        "hookSpecificOutput": {
-                            "hookEventName": "Stop",
-                            "additionalContext": continuation,
-                        },
-                    }
-                )
-            )
-        else:
-            print(json.dumps({"continue": True, "suppressOutput": True}))
+            return {
+                "continue": True,
+                "hookSpecificOutput": {
+                    "hookEventName": "Stop",
+                    "additionalContext": continuation,
+                },
+            }
+        return {"continue": True, "suppressOutput": True}
 
     except Exception:
-        print(json.dumps({"continue": True, "suppressOutput": True}))
+        return {"continue": True, "suppressOutput": True}
+
+
+def main():
+    input_str = read_stdin()
+    data = {}
+    try:
+        data = json.loads(input_str)
+    except Exception:
+        pass
+    print(json.dumps(handle(data)))
 
 
 if __name__ == "__main__":
@@ -13,6 +13,8 @@ import os
 import re
 from pathlib import Path
 
+import omd_cache
+
 
 def read_stdin():
     try:
@@ -24,12 +26,10 @@ def read_stdin():
 STATE_FILE = Path.home() / ".factory" / ".session-stats.json"
 
 
-def load_stats():
-    try:
-        if STATE_FILE.exists():
-            return json.loads(STATE_FILE.read_text())
-    except Exception:
-        pass
+def load_stats(copy=False):
+    stats = (omd_cache.read_json_copy if copy else omd_cache.read_json)(STATE_FILE)
+    if isinstance(stats, dict) and isinstance(stats.get("sessions"), dict):
+        return stats
     return {"sessions": {}}
 
 
@@ -37,12 +37,19 @@ def save_stats(stats):
     try:
         STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
         STATE_FILE.write_text(json.dumps(stats, indent=2))
+        omd_cache.store(STATE_FILE, stats)
     except Exception:
-        pass
+        omd_cache.invalidate(STATE_FILE)
 
 
 def update_stats(tool_name, session_id):
-    stats = load_stats()
+    with omd_cache.updating(STATE_FILE):
+        return _update_stats(tool_name, session_id)
+
+
+def _update_stats(tool_name, session_id):
+    # A copy: the cached stats may be read by other daemon threads meanwhile
+    stats = load_stats(copy=True)
     if session_id not in stats["sessions"]:
         stats["sessions"][session_id] = {
             "tool_counts": {},
@@ -86,32 +93,30 @@ def detect_background(output):
     return any(p.search(output) for p in BG_PATTERNS)
 
 
+def summarize_droids(data):
+    agents = data.get("agents", [])
+    running = [a for a in agents if a.get("status") == "running"]
+    completed = data.get("total_completed", 0)
+    failed = data.get("total_failed", 0)
+    if not running and completed == 0 and failed == 0:
+        return ""
+    parts = []
+    if running:
+        names = ", ".join(
+            a.get("agent_type", "?").replace("oh-my-droid:", "")
+            for a in running
+        )
+        parts.append(f"Running: {len(running)} [{names}]")
+    if completed > 0:
+        parts.append(f"Completed: {completed}")
+    if failed > 0:
+        parts.append(f"Failed: {failed}")
+    return " | ".join(parts)
+
+
 def get_droid_summary(directory):
     tracking_file = Path(directory) / ".omd" / "state" / "subagent-tracking.json"
-    try:
-        if tracking_file.exists():
-            data = json.loads(tracking_file.read_text())
-            agents = data.get("agents", [])
-            running = [a for a in agents if a.get("status") == "running"]
-            completed = data.get("total_completed", 0)
-            failed = data.get("total_failed", 0)
-            if not running and completed == 0 and failed == 0:
-                return ""
-            parts = []
-            if running:
-                names = ", ".join(
-                    a.get("agent_type", "?").replace("oh-my-droid:", "")
-                    for a in running
-                )
-                parts.append(f"Running: {len(running)} [{names}]")
-            if completed > 0:
-                parts.append(f"Completed: {completed}")
-            if failed > 0:
-                parts.append(f"Failed: {failed}")
-            return " | ".join(parts)
-    except Exception:
-        pass
-    return ""
+    return omd_cache.derive(tracking_file, "droid-summary", summarize_droids, "")
 
 
 def generate_message(tool_name, tool_output, tool_count, directory):
@@ -164,10 +169,10 @@ def generate_message(tool_name, tool_output, tool_count, directory):
     return message
 
 
-def main():
+def handle(data):
     try:
-        input_str = read_stdin()
-        data = json.loads(input_str)
+        if not data:
+            return {"continue": True, "suppressOutput": True}
 
         tool_name = data.get("tool_name", data.get("toolName", ""))
         raw_response = data.get("tool_response", data.get("toolOutput", ""))
@@ -189,10 +194,20 @@ def main():
         else:
             response["suppressOutput"] = True
 
-        print(json.dumps(response))
+        return response
 
     except Exception:
-        print(json.dumps({"continue": True, "suppressOutput": True}))
+        return {"continue": True, "suppressOutput": True}
+
+
+def main():
+    input_str = read_stdin()
+    data = {}
+    try:
+        data = json.loads(input_str)
+    except Exception:
+        pass
+    print(json.dumps(handle(data)))
 
 
 if __name__ == "__main__":
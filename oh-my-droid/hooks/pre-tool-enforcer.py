@@ -12,6 +12,8 @@ import sys
 import os
 from pathlib import Path
 
+import omd_cache
+
 
 def read_stdin():
     try:
@@ -20,6 +22,21 @@ def read_stdin():
         return ""
 
 
+def count_todos(data):
+    todos = data.get("todos", []) if isinstance(data, dict) else data
+    if not isinstance(todos, list):
+        return [0, 0]
+    pending = sum(1 for t in todos if t.get("status") == "pending")
+    in_progress = sum(1 for t in todos if t.get("status") == "in_progress")
+    return [pending, in_progress]
+
+
+def summarize_tracking(data):
+    agents = data.get("agents", [])
+    running = sum(1 for a in agents if a.get("status") == "running")
+    return {"running": running, "total": data.get("total_spawned", 0)}
+
+
 def get_todo_status(directory):
     todo_paths = [
         Path(directory) / ".omd" / "todos.json",
@@ -28,16 +45,9 @@ def get_todo_status(directory):
     in_progress = 0
 
     for todo_file in todo_paths:
-        try:
-            if todo_file.exists():
-                data = json.loads(todo_file.read_text())
-                todos = data.get("todos", data if isinstance(data, list) else [])
-                pending += sum(1 for t in todos if t.get("status") == "pending")
-                in_progress += sum(
-                    1 for t in todos if t.get("status") == "in_progress"
-                )
-        except Exception:
-            pass
+        counts = omd_cache.derive(todo_file, "todo-counts", count_todos, [0, 0])
+        pending += counts[0]
+        in_progress += counts[1]
 
     if pending + in_progress > 0:
         return f"[{in_progress} active, {pending} pending] "
@@ -46,15 +56,9 @@ def get_todo_status(directory):
 
 def get_droid_tracking_info(directory):
     tracking_file = Path(directory) / ".omd" / "state" / "subagent-tracking.json"
-    try:
-        if tracking_file.exists():
-            data = json.loads(tracking_file.read_text())
-            agents = data.get("agents", [])
-            running = sum(1 for a in agents if a.get("status") == "running")
-            return {"running": running, "total": data.get("total_spawned", 0)}
-    except Exception:
-        pass
-    return {"running": 0, "total": 0}
+    return omd_cache.derive(
+        tracking_file, "droid-tracking", summarize_tracking, {"running": 0, "total": 0}
+    )
 
 
 TOOL_MESSAGES = {
@@ -92,15 +96,8 @@ def generate_message(tool_name, todo_status, tool_input=None, directory=""):
     return f"{todo_status}{msg}" if todo_status and not msg.startswith("[") else msg
 
 
-def main():
+def handle(data):
     try:
-        input_str = read_stdin()
-        data = {}
-        try:
-            data = json.loads(input_str)
-        except Exception:
-            pass
-
         tool_name = data.get("tool_name", data.get("toolName", "unknown"))
         directory = data.get("cwd", data.get("directory", os.getcwd()))
         tool_input = data.get("tool_input", data.get("toolInput"))
@@ -108,20 +105,26 @@ def main():
         todo_status = get_todo_status(directory)
         message = generate_message(tool_name, todo_status, tool_input, directory)
 
-        print(
-            json.dumps(
-                {
-                    "continue": True,
-                    "hookSpecificOutput": {
-                        "hookEventName": "PreToolUse",
-                        "additionalContext": message,
-                    },
-                }
-            )
-        )
+        return {
+            "continue": True,
+            "hookSpecificOutput": {
+                "hookEventName": "PreToolUse",
+                "additionalContext": message,
+            },
+        }
+
+    except Exception:
+        return {"continue": True, "suppressOutput": True}
+
 
+def main():
+    input_str = read_stdin()
+    data = {}
+    try:
+        data = json.loads(input_str)
     except Exception:
-        print(json.dumps({"continue": True, "suppressOutput": True}))
+        pass
+    print(json.dumps(handle(data)))
 
 
 if __name__ == "__main__":
@@ -18,6 +18,8 @@ import time
 from pathlib import Path
 from typing import Optional
 
+import omd_cache
+
 OMD_DIR = ".omd"
 MEMORY_FILE = "project-memory.json"
 NOTEPAD_FILE = "notepad.md"
@@ -227,19 +229,15 @@ def get_memory_path(project_root: str) -> Path:
 
 
 def load_memory(project_root: str) -> Optional[dict]:
-    path = get_memory_path(project_root)
-    try:
-        if path.exists():
-            return json.loads(path.read_text())
-    except Exception:
-        pass
-    return None
+    return omd_cache.read_json(get_memory_path(project_root))
 
 
 def save_memory(project_root: str, memory: dict):
     omd_dir = get_memory_dir(project_root)
     omd_dir.mkdir(parents=True, exist_ok=True)
-    get_memory_path(project_root).write_text(json.dumps(memory, indent=2, ensure_ascii=False))
+    path = get_memory_path(project_root)
+    path.write_text(json.dumps(memory, indent=2, ensure_ascii=False))
+    omd_cache.store(path, memory)
 
 
 def should_rescan(memory: dict) -> bool:
@@ -322,7 +320,13 @@ def format_context_summary(memory: dict) -> str:
 # --- Learning ---
 
 def learn_from_tool_output(tool_name: str, tool_input: dict, tool_output, project_root: str):
-    memory = load_memory(project_root)
+    with omd_cache.updating(get_memory_path(project_root)):
+        _learn_from_tool_output(tool_name, tool_input, tool_output, project_root)
+
+
+def _learn_from_tool_output(tool_name: str, tool_input: dict, tool_output, project_root: str):
+    # A copy: the cached memory may be read by other daemon threads meanwhile
+    memory = omd_cache.read_json_copy(get_memory_path(project_root))
     if not memory:
         return
 
@@ -503,54 +507,55 @@ def handle_pre_compact(data: dict):
     return "\n\n".join(messages) if messages else None
 
 
-# --- CLI ---
-
-def main():
-    """Dispatch based on first argument: session-start, post-tool, pre-compact."""
-    action = sys.argv[1] if len(sys.argv) > 1 else "session-start"
-
-    try:
-        input_str = sys.stdin.read()
-        data = json.loads(input_str) if input_str.strip() else {}
-    except Exception:
-        data = {}
+# --- Dispatch ---
 
+def handle(data: dict, action: str = "session-start") -> dict:
+    """Run one hook action against a parsed payload and build the response."""
     try:
         if action == "session-start":
             context = handle_session_start(data)
             if context:
-                print(json.dumps({
+                return {
                     "continue": True,
                     "hookSpecificOutput": {
                         "hookEventName": "SessionStart",
                         "additionalContext": context,
                     },
-                }))
-            else:
-                print(json.dumps({"continue": True, "suppressOutput": True}))
+                }
 
         elif action == "post-tool":
             handle_post_tool(data)
-            print(json.dumps({"continue": True, "suppressOutput": True}))
 
         elif action == "pre-compact":
             context = handle_pre_compact(data)
             if context:
-                print(json.dumps({
+                return {
                     "continue": True,
                     "hookSpecificOutput": {
                         "hookEventName": "PreCompact",
                         "additionalContext": context,
                     },
-                }))
-            else:
-                print(json.dumps({"continue": True, "suppressOutput": True}))
+                }
+
+    except Exception:
+        pass
+
+    return {"continue": True, "suppressOutput": True}
 
-        else:
-            print(json.dumps({"continue": True, "suppressOutput": True}))
 
+# --- CLI ---
+
+def main():
+    """Dispatch based on first argument: session-start, post-tool, pre-compact."""
+    action = sys.argv[1] if len(sys.argv) > 1 else "session-start"
+
+    try:
+        input_str = sys.stdin.read()
+        data = json.loads(input_str) if input_str.strip() else {}
     except Exception:
-        print(json.dumps({"continue": True, "suppressOutput": True}))
+        data = {}
+
+    print(json.dumps(handle(data, action)))
 
 
 if __name__ == "__main__":
@@ -12,6 +12,9 @@ import sys
 import os
 from pathlib import Path
 
+import omd_cache
+import omd_modes
+
 
 def read_stdin():
     try:
@@ -21,49 +24,33 @@ def read_stdin():
 
 
 def read_json_file(path):
-    try:
-        p = Path(path)
-        if p.exists():
-            return json.loads(p.read_text())
-    except Exception:
-        pass
-    return None
+    return omd_cache.read_json(path)
 
 
-def main():
-    try:
-        input_str = read_stdin()
-        data = {}
-        try:
-            data = json.loads(input_str)
-        except Exception:
-            pass
+def count_incomplete_todos(data):
+    todos = data.get("todos", []) if isinstance(data, dict) else data
+    if not isinstance(todos, list):
+        return 0
+    return sum(1 for t in todos if t.get("status") not in ("completed", "cancelled"))
 
+
+def handle(data):
+    try:
         directory = data.get("cwd", data.get("directory", os.getcwd()))
         session_id = data.get("session_id", data.get("sessionId", ""))
         messages = []
 
+        modes = omd_modes.read_modes(directory, session_id)
+
         # Check ultrawork state
-        ultrawork_state = None
-        if session_id:
-            ultrawork_state = read_json_file(
-                Path(directory)
-                / ".omd"
-                / "state"
-                / "sessions"
-                / session_id
-                / "ultrawork-state.json"
-            )
-            if (
-                ultrawork_state
-                and ultrawork_state.get("session_id")
-                and ultrawork_state["session_id"] != session_id
-            ):
-                ultrawork_state = None
-        else:
-            ultrawork_state = read_json_file(
-                Path(directory) / ".omd" / "state" / "ultrawork-state.json"
-            )
+        ultrawork_state = modes.get("ultrawork")
+        if (
+            session_id
+            and ultrawork_state
+            and ultrawork_state.get("session_id")
+            and ultrawork_state["session_id"] != session_id
+        ):
+            ultrawork_state = None
 
         if ultrawork_state and ultrawork_state.get("active"):
             messages.append(
@@ -83,26 +70,14 @@ Continue working in ultrawork mode until all tasks are complete.
             )
 
         # Check ralph state
-        ralph_state = None
-        if session_id:
-            ralph_state = read_json_file(
-                Path(directory)
-                / ".omd"
-                / "state"
-                / "sessions"
-                / session_id
-                / "ralph-state.json"
-            )
-            if (
-                ralph_state
-                and ralph_state.get("session_id")
-                and ralph_state["session_id"] != session_id
-            ):
-                ralph_state = None
-        else:
-            ralph_state = read_json_file(
-                Path(directory) / ".omd" / "state" / "ralph-state.json"
-            )
+        ralph_state = modes.get("ralph")
+        if (
+            session_id
+            and ralph_state
+            and ralph_state.get("session_id")
+            and ralph_state["session_id"] != session_id
+        ):
+            ralph_state = None
 
         if ralph_state and ralph_state.get("active"):
             messages.append(
@@ -122,20 +97,7 @@ Continue working until the task is verified complete.
             )
 
         # Check autopilot state
-        autopilot_state = None
-        if session_id:
-            autopilot_state = read_json_file(
-                Path(directory)
-                / ".omd"
-                / "state"
-                / "sessions"
-                / session_id
-                / "autopilot-state.json"
-            )
-        else:
-            autopilot_state = read_json_file(
-                Path(directory) / ".omd" / "state" / "autopilot-state.json"
-            )
+        autopilot_state = modes.get("autopilot")
 
         if autopilot_state and autopilot_state.get("active"):
             messages.append(
@@ -160,14 +122,9 @@ Continue working autonomously until task completion.
         ]
         incomplete_count = 0
         for todo_file in todo_paths:
-            state_data = read_json_file(todo_file)
-            if state_data:
-                todos = state_data.get("todos", state_data if isinstance(state_data, list) else [])
-                incomplete_count += sum(
-                    1
-                    for t in todos
-                    if t.get("status") not in ("completed", "cancelled")
-                )
+            incomplete_count += omd_cache.derive(
+                todo_file, "todo-incomplete", count_incomplete_todos, 0
+            )
 
         if incomplete_count > 0:
             messages.append(
@@ -185,22 +142,27 @@ Please continue working on these tasks.
             )
 
         if messages:
-            print(
-                json.dumps(
-                    {
-                        "continue": True,
-                        "hookSpecificOutput": {
-                            "hookEventName": "SessionStart",
-                            "additionalContext": "\n".join(messages),
-                        },
-                    }
-                )
-            )
-        else:
-            print(json.dumps({"continue": True, "suppressOutput": True}))
+            return {
+                "continue": True,
+                "hookSpecificOutput": {
+                    "hookEventName": "SessionStart",
+                    "additionalContext": "\n".join(messages),
+                },
+            }
+        return {"continue": True, "suppressOutput": True}
 
     except Exception:
-        print(json.dumps({"continue": True, "suppressOutput": True}))
+        return {"continue": True, "suppressOutput": True}
+
+
+def main():
+    input_str = read_stdin()
+    data = {}
+    try:
+        data = json.loads(input_str)
+    except Exception:
+        pass
+    print(json.dumps(handle(data)))
 
 
 if __name__ == "__main__":
@@ -4,23 +4,75 @@ State Manager for oh-my-droid
 
 Manages task state with embedded spec and routing info.
 Agents can read/write state via environment variables or direct file access.
+
+When a task finishes, its outcome (completed or error, retries, duration)
+is credited to the droid that ran it, so intelligent-router.py --objective
+can pick tiers from history (see omd_route_outcomes.py). A task moved
+back to pending/executing after an error counts as a retry.
+
+Tasks are kept by a pluggable store (see omd_task_store.py): one JSON file
+per task by default (with an index journal and status counters, so
+summaries and filtered listings skip parsing every task; `reindex`
+checks and rebuilds them), an SQLite database in WAL mode, or per-task
+logs of appended changes with snapshots (`compact` folds them), once
+`state-manager.py migrate` has copied the tasks there.
+
+Task IDs are "task_" plus a ULID (48-bit millisecond time and 80 random
+bits in Crockford base32), so they sort by creation time and tasks
+created in the same second no longer overwrite each other.
+`create-batch` creates many tasks from JSONL and makes them durable together.
+
+The JSON store keeps finished tasks in day (or hour) partitions that
+`cleanup` deletes whole; `cleanup --archive` (or OMD_STATE_ARCHIVE=1)
+first appends what it removes to one gzip'd JSONL file per day.
 """
 
 import json
 import os
+import sys
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 
+import omd_route_outcomes
+import omd_task_store
+
 STATE_DIR = Path.home() / '.factory' / '.omd' / 'state'
 
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+
+_last_id = (0, 0)
+
+
+def new_task_id() -> str:
+    """
+    "task_" + a ULID. Within one millisecond (or if the clock steps back)
+    the random part is incremented instead of redrawn, so IDs from one
+    process are strictly increasing.
+    """
+    global _last_id
+    ms = time.time_ns() // 1_000_000
+    last_ms, last_random = _last_id
+    if ms <= last_ms:
+        ms, random = last_ms, last_random + 1
+        if random >> RANDOM_BITS:
+            ms, random = ms + 1, 0
+    else:
+        random = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+    _last_id = (ms, random)
+    value = (ms << RANDOM_BITS) | random
+    return "task_" + "".join(CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5))
+
 
 class StateManager:
     """Manages task state with spec and routing integration"""
     
-    def __init__(self):
-        """Initialize state directory"""
+    def __init__(self, store: Optional[omd_task_store.TaskStore] = None):
+        """Initialize state directory and task store"""
         STATE_DIR.mkdir(parents=True, exist_ok=True)
+        self.store = store or omd_task_store.open_store(STATE_DIR)
     
     def _get_state_path(self, key: str) -> Path:
         """Get state file path"""
@@ -37,10 +89,35 @@ class StateManager:
         Returns:
             task_id: Unique task identifier
         """
-        task_id = f"task_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        task = self._new_task(prompt, routing)
+        self.store.put(task)
+        return task["id"]
+    
+    def create_tasks(self, batch: list) -> list:
+        """
+        Create many tasks at once, e.g. the subtasks of a fan-out
+        
+        Args:
+            batch: {"prompt", "routing"} dicts, optionally with "session_id"
+        
+        Returns:
+            task_ids: In batch order, ascending
         
-        state = {
-            "id": task_id,
+        The whole batch is saved together and is on disk when this returns.
+        """
+        tasks = []
+        for item in batch:
+            task = self._new_task(item["prompt"], item["routing"])
+            if item.get("session_id"):
+                task["session_id"] = item["session_id"]
+            tasks.append(task)
+        self.store.put_many(tasks, sync=True)
+        return [task["id"] for task in tasks]
+    
+    def _new_task(self, prompt: str, routing: Dict[str, Any]) -> Dict[str, Any]:
+        """A pending task with a fresh ID"""
+        return {
+            "id": new_task_id(),
             "prompt": prompt,
             "routing": routing,              # Embedded router decision
             "spec": None,                       # Filled by agent
@@ -53,35 +130,55 @@ class StateManager:
             "started_at": None,
             "completed_at": None,
         }
-        
-        self.save(f"tasks/{task_id}", state)
-        return task_id
     
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get task state by ID"""
-        path = self._get_state_path(f"tasks/{task_id}")
-        if path.exists():
-            return json.loads(path.read_text())
-        return None
+        return self.store.get(task_id)
     
     def update_task(self, task_id: str, updates: Dict[str, Any]) -> bool:
         """Update task state"""
-        task = self.get_task(task_id)
-        if not task:
-            return False
-        
-        task.update(updates)
-        task["updated_at"] = datetime.now().isoformat()
+        return self._update_task(task_id, lambda task: updates)
+    
+    def _update_task(self, task_id: str, make_updates) -> bool:
+        """Update task state with make_updates(current task), read once"""
+        previous = {}
         
-        # Auto-update timestamps based on status
-        if updates.get("status") == "executing" and not task.get("started_at"):
-            task["started_at"] = datetime.now().isoformat()
-        if updates.get("status") in ["completed", "error"]:
-            task["completed_at"] = datetime.now().isoformat()
+        def apply(task: Dict[str, Any]) -> None:
+            previous["status"] = task.get("status")
+            previous["updates"] = updates = make_updates(task)
+            task.update(updates)
+            task["updated_at"] = datetime.now().isoformat()
+            
+            # Auto-update timestamps based on status
+            if updates.get("status") == "executing" and not task.get("started_at"):
+                task["started_at"] = datetime.now().isoformat()
+            if updates.get("status") in ["completed", "error"]:
+                task["completed_at"] = datetime.now().isoformat()
+            if previous["status"] == "error" and updates.get("status") in ["pending", "executing"]:
+                task["retries"] = task.get("retries", 0) + 1
         
-        self.save(f"tasks/{task_id}", task)
+        task = self.store.update(task_id, apply)
+        if not task:
+            return False
+        status = previous["updates"].get("status")
+        if status in ["completed", "error"] and previous["status"] not in ["completed", "error"]:
+            self._record_outcome(task)
         return True
     
+    def _record_outcome(self, task: Dict[str, Any]) -> None:
+        """Credit a finished task's outcome to the droid that ran it"""
+        routing = task.get("routing") or {}
+        droid = task.get("agent") or routing.get("droid") or routing.get("agent")
+        seconds = None
+        try:
+            started = task.get("started_at") or task.get("created_at")
+            seconds = (datetime.fromisoformat(task["completed_at"])
+                       - datetime.fromisoformat(started)).total_seconds()
+        except (TypeError, ValueError, KeyError):
+            pass
+        omd_route_outcomes.record(task.get("prompt", ""), droid,
+                                  task["status"] == "completed", task.get("retries", 0), seconds)
+    
     def update_progress(self, task_id: str, progress: int, message: Optional[str] = None):
         """Update task progress"""
         return self.update_task(task_id, {
@@ -105,10 +202,10 @@ class StateManager:
     
     def set_task_agent(self, task_id: str, agent: str, spec: str):
         """Agent updates its spec in state"""
-        return self.update_task(task_id, {
+        return self._update_task(task_id, lambda task: {
             "agent": agent,
             "spec": spec,
-            "status": "executing" if not self.get_task(task_id).get("started_at") else "pending"
+            "status": "executing" if not task.get("started_at") else "pending"
         })
     
     def save(self, key: str, data: Dict[str, Any]):
@@ -126,42 +223,18 @@ class StateManager:
     
     def get_session_tasks(self, session_id: Optional[str] = None) -> list:
         """Get all tasks, optionally filtered by session"""
-        tasks = []
-        for file in STATE_DIR.glob("tasks/*.json"):
-            try:
-                task = json.loads(file.read_text())
-                if session_id is None or task.get("session_id") == session_id:
-                    tasks.append(task)
-            except (json.JSONDecodeError, KeyError):
-                continue
-        return tasks
+        return self.store.tasks(session_id=session_id)
     
     def get_pending_tasks(self) -> list:
         """Get all pending tasks"""
-        return [t for t in self.get_session_tasks() if t.get("status") in ["pending", "executing"]]
+        return self.store.tasks(statuses=["pending", "executing"])
     
-    def cleanup_old_tasks(self, max_age_hours: int = 24) -> int:
-        """Remove completed tasks older than max_age_hours"""
-        import time
-        now = time.time()
-        removed = 0
-        
-        for file in STATE_DIR.glob("tasks/*.json"):
-            try:
-                task = json.loads(file.read_text())
-                if task.get("status") in ["completed", "error"]:
-                    completed_at = task.get("completed_at")
-                    if completed_at:
-                        from datetime import datetime
-                        dt = datetime.fromisoformat(completed_at)
-                        age_hours = (now - dt.timestamp()) / 3600
-                        if age_hours > max_age_hours:
-                            file.unlink()
-                            removed += 1
-            except (json.JSONDecodeError, KeyError, ValueError):
-                continue
-        
-        return removed
+    def cleanup_old_tasks(self, max_age_hours: int = 24, archive: Optional[bool] = None) -> int:
+        """Remove completed tasks older than max_age_hours, archiving them if asked"""
+        if archive is None:
+            archive = os.getenv("OMD_STATE_ARCHIVE") == "1"
+        cutoff = datetime.now() - timedelta(hours=max_age_hours)
+        return self.store.remove_finished(cutoff.isoformat(), archive)
     
     def get_current_task_id(self) -> Optional[str]:
         """Get task ID from environment (for agent use)"""
@@ -169,14 +242,15 @@ class StateManager:
     
     def get_summary(self) -> Dict[str, Any]:
         """Get state summary"""
-        tasks = self.get_session_tasks()
+        counts = self.store.counts()
         return {
-            "total": len(tasks),
-            "pending": len([t for t in tasks if t.get("status") == "pending"]),
-            "executing": len([t for t in tasks if t.get("status") == "executing"]),
-            "completed": len([t for t in tasks if t.get("status") == "completed"]),
-            "error": len([t for t in tasks if t.get("status") == "error"]),
-            "state_dir": str(STATE_DIR)
+            "total": sum(counts.values()),
+            "pending": counts.get("pending", 0),
+            "executing": counts.get("executing", 0),
+            "completed": counts.get("completed", 0),
+            "error": counts.get("error", 0),
+            "state_dir": str(STATE_DIR),
+            "backend": self.store.name
         }
 
 
@@ -214,6 +288,42 @@ def cmd_create(args: list) -> None:
     })
 
 
+def cmd_create_batch(args: list) -> None:
+    """Create tasks from JSONL, one {"prompt", "routing"} (or "agent", "autonomy", ...) per line"""
+    try:
+        source = open(args[0], encoding="utf-8") if args and args[0] != "-" else sys.stdin
+    except OSError as e:
+        output_json({"error": str(e)})
+        sys.exit(1)
+    
+    batch = []
+    with source:
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                prompt = item["prompt"]
+                routing = item.get("routing") or {
+                    "agent": item["agent"],
+                    "autonomy": item.get("autonomy", "medium"),
+                    "reason": item.get("reason", "Manual assignment"),
+                    "confidence": float(item.get("confidence", 1.0))
+                }
+            except (ValueError, KeyError, TypeError, AttributeError):
+                output_json({"error": f"Line {number}: expected prompt and routing (or agent)",
+                             "usage": "create-batch [file.jsonl|-]"})
+                sys.exit(1)
+            batch.append({"prompt": prompt, "routing": routing, "session_id": item.get("session_id")})
+    
+    task_ids = StateManager().create_tasks(batch) if batch else []
+    
+    output_json({
+        "created": len(task_ids),
+        "task_ids": task_ids
+    })
+
+
 def cmd_update(args: list) -> None:
     """Update task"""
     if len(args) < 2:
@@ -267,16 +377,50 @@ def cmd_list(args: list) -> None:
 
 def cmd_cleanup(args: list) -> None:
     """Cleanup old tasks"""
+    archive = True if "--archive" in args else None
+    args = [a for a in args if a != "--archive"]
     max_hours = int(args[0]) if len(args) > 0 else 24
     manager = StateManager()
-    removed = manager.cleanup_old_tasks(max_hours)
+    removed = manager.cleanup_old_tasks(max_hours, archive)
     
     output_json({
         "cleaned": True,
-        "removed_count": removed
+        "removed_count": removed,
+        "archived": bool(archive or os.getenv("OMD_STATE_ARCHIVE") == "1")
     })
 
 
+def cmd_migrate(args: list) -> None:
+    """Copy tasks between backends (default: JSON files into SQLite)"""
+    target = args[0] if args else "sqlite"
+    current = omd_task_store.backend_name(STATE_DIR)
+    source = args[2] if len(args) > 2 and args[1] == "--from" else current
+    if source == target:
+        source = "json"
+    if target not in omd_task_store.BACKENDS or source not in omd_task_store.BACKENDS or source == target:
+        output_json({"error": "Usage: migrate [sqlite|json|events] [--from sqlite|json|events]"})
+        sys.exit(1)
+    migrated = omd_task_store.migrate(STATE_DIR, source, target)
+    
+    output_json({
+        "migrated": migrated,
+        "from": source,
+        "to": target,
+        "backend": omd_task_store.backend_name(STATE_DIR)
+    })
+
+
+def cmd_compact(args: list) -> None:
+    """Fold task update logs into snapshots (events backend)"""
+    output_json(StateManager().store.compact())
+
+
+def cmd_reindex(args: list) -> None:
+    """Check the task index against the tasks; rebuild it if they drifted"""
+    manager = StateManager()
+    output_json(manager.store.check(repair="--check" not in args))
+
+
 def main():
     """CLI entry point"""
     if len(sys.argv) < 2:
@@ -289,10 +433,14 @@ def main():
     
     commands = {
         "create": cmd_create,
+        "create-batch": cmd_create_batch,
         "update": cmd_update,
         "get": cmd_get,
         "list": cmd_list,
         "cleanup": cmd_cleanup,
+        "migrate": cmd_migrate,
+        "reindex": cmd_reindex,
+        "compact": cmd_compact,
         "summary": lambda args: output_json(StateManager().get_summary()),
     }
     